@@ -1,6 +1,7 @@
 from django.contrib import admin
 from markdownx.admin import MarkdownxModelAdmin
 from .models import BlogPost, BlogCategory, BlogTag
+from .search import filter_by_search
 
 
 @admin.register(BlogPost)
@@ -27,17 +28,26 @@ class BlogPostAdmin(MarkdownxModelAdmin):
             'fields': ('published', 'created_date')
         }),
     )
+    
+    def get_search_results(self, request, queryset, search_term):
+        # Use the FTS5 index rather than LIKE scans over the Markdown column
+        results = filter_by_search(queryset, search_term)
+        if results is None:
+            return super().get_search_results(request, queryset, search_term)
+        return results, False
 
 
 @admin.register(BlogCategory)
 class BlogCategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'slug']
+    list_display = ['name', 'slug', 'published_post_count']
+    readonly_fields = ['published_post_count']
     prepopulated_fields = {'slug': ('name',)}
     search_fields = ['name']
 
 
 @admin.register(BlogTag)
 class BlogTagAdmin(admin.ModelAdmin):
-    list_display = ['name', 'slug']
+    list_display = ['name', 'slug', 'published_post_count']
+    readonly_fields = ['published_post_count']
     prepopulated_fields = {'slug': ('name',)}
     search_fields = ['name']
@@ -0,0 +1,216 @@
+"""
+Per-process facet index over published blog posts.
+
+Published posts are numbered by their position in the list order
+(newest first, id as tiebreaker). Each category and tag is a bitset of
+those positions stored as a Python ``int``, so one ``|`` answers the
+category/tag OR-filter, ``int.bit_count()`` gives totals and
+"if you add this facet" counts, and the set bits of the selection are
+already in page order.
+
+The index is rebuilt (three queries) when the version stamp of any table
+it is built from moves (``home.dependencies`` bumps them on every
+write). Requests in between never touch the M2M tables, so the index
+declares those tables as dependencies of whatever is being rendered.
+Its selections match ``blog.models.filter_posts_by_taxonomy``, the SQL
+version of the filter.
+"""
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+
+from home.dependencies import record_tables, table_stamp
+from home.versions import get_versions
+
+from .models import BlogCategory, BlogPost, BlogTag
+from .pagination import CursorPage, decode_cursor
+
+
+FACET_TABLES = (
+    BlogPost._meta.db_table,
+    BlogPost.categories.through._meta.db_table,
+    BlogPost.tags.through._meta.db_table,
+    BlogCategory._meta.db_table,
+    BlogTag._meta.db_table,
+)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def _sort_key(created, pk):
+    # Ascending order of this key is the list's descending (created, id) order.
+    return (-((created - _EPOCH) // _MICROSECOND), -pk)
+
+
+def _bitset(positions, size):
+    buffer = bytearray((size + 7) // 8)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+class FacetIndex:
+    def __init__(self, version, posts, category_links, tag_links):
+        """``posts`` is ``[(pk, created_date), ...]`` in list order; links are ``(post_pk, slug)``."""
+        self.version = version
+        self.ids = [pk for pk, _ in posts]
+        self.sort_keys = [_sort_key(created, pk) for pk, created in posts]
+        self.all = (1 << len(self.ids)) - 1
+        position = {pk: index for index, pk in enumerate(self.ids)}
+        self.categories = self._facet(category_links, position)
+        self.tags = self._facet(tag_links, position)
+
+    def _facet(self, links, position):
+        positions = {}
+        for post_pk, slug in links:
+            if post_pk in position:
+                positions.setdefault(slug, []).append(position[post_pk])
+        return {slug: _bitset(found, len(self.ids)) for slug, found in positions.items()}
+
+    def select(self, category_slugs=(), tag_slugs=()):
+        """Bitset of posts in any of the given categories or tags (all posts if none)."""
+        if not category_slugs and not tag_slugs:
+            return self.all
+        mask = 0
+        for slug in category_slugs:
+            mask |= self.categories.get(slug, 0)
+        for slug in tag_slugs:
+            mask |= self.tags.get(slug, 0)
+        return mask
+
+    def toggle_counts(self, category_slugs=(), tag_slugs=()):
+        """Return ``({category_slug: n}, {tag_slug: n})``: posts listed if that facet is toggled on.
+
+        With nothing selected (and for facets already selected) that is the
+        facet's own size; otherwise it is the size of the current selection
+        plus the facet.
+        """
+        mask = self.select(category_slugs, tag_slugs)
+        filtered = bool(category_slugs or tag_slugs)
+
+        def counts(facets, selected):
+            return {
+                slug: (mask | bits if filtered and slug not in selected else bits).bit_count()
+                for slug, bits in facets.items()
+            }
+
+        return counts(self.categories, set(category_slugs)), counts(self.tags, set(tag_slugs))
+
+    def positions(self, mask, start=0):
+        """Yield set-bit positions of ``mask`` in list order, from ``start``."""
+        bits = bin(mask)[:1:-1]  # character i is bit i
+        position = bits.find('1', start)
+        while position != -1:
+            yield position
+            position = bits.find('1', position + 1)
+
+    def positions_before(self, mask, stop, limit):
+        """The last ``limit`` set-bit positions of ``mask`` before ``stop``, in list order."""
+        bits = bin(mask)[:1:-1][:stop]
+        found = []
+        position = bits.rfind('1')
+        while position != -1 and len(found) < limit:
+            found.append(position)
+            position = bits.rfind('1', 0, position)
+        found.reverse()
+        return found
+
+    def cursor_window(self, mask, cursor, per_page):
+        """Return ``(ids, has_next, has_previous)`` for a keyset cursor."""
+        decoded = decode_cursor(cursor)
+        if decoded is None:
+            start, direction = 0, 'next'
+        else:
+            created, pk, direction = decoded
+            key = _sort_key(created, pk)
+            if direction == 'next':
+                start = bisect_right(self.sort_keys, key)
+            else:
+                stop = bisect_left(self.sort_keys, key)
+
+        if direction == 'next':
+            positions = []
+            for position in self.positions(mask, start):
+                positions.append(position)
+                if len(positions) > per_page:
+                    break
+            ids = [self.ids[position] for position in positions[:per_page]]
+            return ids, len(positions) > per_page, decoded is not None
+
+        positions = self.positions_before(mask, stop, per_page + 1)
+        ids = [self.ids[position] for position in positions[-per_page:]]
+        return ids, True, len(positions) > per_page
+
+
+class FacetSelection:
+    """The posts matching a facet selection, sliceable like a queryset.
+
+    Slices and cursor windows resolve positions in the index and load just
+    those posts from ``queryset`` by primary key.
+    """
+
+    def __init__(self, index, mask, queryset):
+        self.index = index
+        self.mask = mask
+        self.queryset = queryset
+
+    def count(self):
+        return self.mask.bit_count()
+
+    def __len__(self):
+        return self.count()
+
+    def _load(self, ids):
+        posts = self.queryset.in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice) or item.step not in (None, 1):
+            raise TypeError('FacetSelection only supports contiguous slices.')
+        start, stop = item.start or 0, item.stop
+        ids = []
+        for offset, position in enumerate(self.index.positions(self.mask)):
+            if stop is not None and offset >= stop:
+                break
+            if offset >= start:
+                ids.append(self.index.ids[position])
+        return self._load(ids)
+
+    def cursor_page(self, cursor, per_page):
+        ids, has_next, has_previous = self.index.cursor_window(self.mask, cursor, per_page)
+        return CursorPage(self._load(ids), has_next=has_next, has_previous=has_previous)
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def build_facet_index(version):
+    posts = list(
+        BlogPost.objects.filter(published=True)
+        .order_by('-created_date', '-pk')
+        .values_list('pk', 'created_date')
+    )
+    category_links = BlogPost.categories.through.objects.filter(
+        blogpost__published=True,
+    ).values_list('blogpost_id', 'blogcategory__slug')
+    tag_links = BlogPost.tags.through.objects.filter(
+        blogpost__published=True,
+    ).values_list('blogpost_id', 'blogtag__slug')
+    return FacetIndex(version, posts, category_links, tag_links)
+
+
+def get_facet_index():
+    """Return this process's facet index, rebuilding it if its tables were written to."""
+    global _index
+    record_tables(*FACET_TABLES)
+    stamps = get_versions(*(table_stamp(table) for table in FACET_TABLES))
+    version = tuple(sorted(stamps.items()))
+    index = _index
+    if index is None or index.version != version:
+        with _lock:
+            if _index is None or _index.version != version:
+                _index = build_facet_index(version)
+            index = _index
+    return index
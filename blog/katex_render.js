@@ -0,0 +1,21 @@
+// Render TeX formulas with KaTeX for blog.math_rendering.
+//
+// Usage: node katex_render.js <path to the katex package>
+// Reads [[tex, displayMode], ...] as JSON on stdin and writes a JSON array
+// with the rendered HTML of each formula (null if KaTeX failed outright).
+const katex = require(process.argv[2]);
+
+let input = '';
+process.stdin.setEncoding('utf8');
+process.stdin.on('data', (chunk) => { input += chunk; });
+process.stdin.on('end', () => {
+    const output = JSON.parse(input).map(([tex, displayMode]) => {
+        try {
+            // Same options as the client-side auto-render fallback.
+            return katex.renderToString(tex, { displayMode, throwOnError: false });
+        } catch (error) {
+            return null;
+        }
+    });
+    process.stdout.write(JSON.stringify(output));
+});
@@ -0,0 +1,135 @@
+"""
+Benchmark blog category/tag filtering: EXISTS subqueries vs. join + DISTINCT.
+
+Seeds a synthetic archive inside a transaction that is always rolled back,
+checks both strategies return the same posts, and fails if the EXISTS
+query plan still needs a temp B-tree (SQLite only).
+
+Usage:
+    python manage.py benchmark_blog_filters
+    python manage.py benchmark_blog_filters --posts 50000 --tags-per-post 16
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from blog.models import BlogCategory, BlogPost, BlogTag, filter_posts_by_taxonomy
+
+
+class Rollback(Exception):
+    """Raised to discard the seeded data once the benchmark is done."""
+
+
+def legacy_filter(queryset, category_slugs, tag_slugs):
+    """The join-based OR filter previously used by ``blog_list``."""
+    filter_q = Q()
+    if category_slugs:
+        filter_q |= Q(categories__slug__in=category_slugs)
+    if tag_slugs:
+        filter_q |= Q(tags__slug__in=tag_slugs)
+    return queryset.filter(filter_q).distinct()
+
+
+class Command(BaseCommand):
+    help = 'Compare EXISTS-based blog taxonomy filtering with the join + DISTINCT version.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=20000, help='Posts to seed')
+        parser.add_argument('--categories', type=int, default=20, help='Categories to seed')
+        parser.add_argument('--tags', type=int, default=300, help='Tags to seed')
+        parser.add_argument('--tags-per-post', type=int, default=8, help='Tags attached to each post')
+        parser.add_argument('--filter-slugs', type=int, default=3, help='Category and tag slugs per filter')
+        parser.add_argument('--repeat', type=int, default=5, help='Timing repetitions (best is reported)')
+
+    def _time(self, func, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def _seed(self, options):
+        rng = random.Random(0)
+        now = timezone.now()
+        categories = BlogCategory.objects.bulk_create(
+            BlogCategory(name=f'Bench category {i}', slug=f'bench-category-{i}')
+            for i in range(options['categories'])
+        )
+        tags = BlogTag.objects.bulk_create(
+            BlogTag(name=f'Bench tag {i}', slug=f'bench-tag-{i}') for i in range(options['tags'])
+        )
+        posts = BlogPost.objects.bulk_create(
+            BlogPost(
+                title=f'Bench post {i}', slug=f'bench-post-{i}', author='Bench',
+                content='Benchmark post.', excerpt='Benchmark post.',
+                published=i % 10 != 0, created_date=now - timezone.timedelta(minutes=i),
+            )
+            for i in range(options['posts'])
+        )
+        CategoryLink = BlogPost.categories.through
+        TagLink = BlogPost.tags.through
+        CategoryLink.objects.bulk_create(
+            CategoryLink(blogpost_id=post.pk, blogcategory_id=category.pk)
+            for post in posts
+            for category in rng.sample(categories, min(2, len(categories)))
+        )
+        TagLink.objects.bulk_create(
+            TagLink(blogpost_id=post.pk, blogtag_id=tag.pk)
+            for post in posts
+            for tag in rng.sample(tags, min(options['tags_per_post'], len(tags)))
+        )
+        return (
+            [category.slug for category in categories[:options['filter_slugs']]],
+            [tag.slug for tag in tags[:options['filter_slugs']]],
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _run(self, options):
+        repeat = options['repeat']
+        category_slugs, tag_slugs = self._seed(options)
+        base = BlogPost.objects.filter(published=True).order_by('-created_date', '-pk')
+        legacy = legacy_filter(base, category_slugs, tag_slugs)
+        current = filter_posts_by_taxonomy(base, category_slugs, tag_slugs)
+
+        if list(legacy.values_list('pk', flat=True)) != list(current.values_list('pk', flat=True)):
+            raise CommandError('EXISTS filtering returned different posts from the join + DISTINCT filter.')
+
+        if connection.vendor == 'sqlite':
+            legacy_plan = legacy[:4].explain()
+            plan = current[:4].explain()
+            self.stdout.write(f'Legacy plan:\n{legacy_plan}\n\nEXISTS plan:\n{plan}\n')
+            if 'TEMP B-TREE' in plan:
+                raise CommandError('EXISTS filtering still builds a temp B-tree.')
+        else:
+            self.stdout.write(f'Skipping the query plan check on {connection.vendor}.')
+
+        self.stdout.write(
+            f"Seeded {options['posts']:,} posts, {options['tags_per_post']} tags per post; "
+            f"filtering on {len(category_slugs)} categories OR {len(tag_slugs)} tags"
+        )
+        rows = [
+            ('first page', lambda: list(legacy[:4]), lambda: list(current[:4])),
+            ('deep page', lambda: list(legacy[4000:4004]), lambda: list(current[4000:4004])),
+            ('count', legacy.count, current.count),
+        ]
+        self.stdout.write(f"{'query':<12}{'join+distinct (ms)':>20}{'exists (ms)':>14}{'speedup':>10}")
+        for label, legacy_query, current_query in rows:
+            legacy_time = self._time(legacy_query, repeat)
+            current_time = self._time(current_query, repeat)
+            self.stdout.write(
+                f'{label:<12}{legacy_time * 1000:>20.2f}{current_time * 1000:>14.2f}'
+                f'{legacy_time / current_time:>9.1f}x'
+            )
@@ -0,0 +1,154 @@
+"""
+Benchmark the single-pass math scanner against the previous regex chain.
+
+Usage:
+    python manage.py benchmark_markdown
+    python manage.py benchmark_markdown --formulas 5000 --repeat 5
+"""
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from markdownx.utils import markdownify
+
+from blog.rendering import delimit_math, markdownify_with_math, protect_math, restore_math
+
+
+def legacy_protect_math(content):
+    """The four-pass regex implementation previously used by ``blog_detail``."""
+    placeholders = {}
+    counter = [0]
+
+    def _placeholder(match, display=False):
+        counter[0] += 1
+        key = f"MATHBLOCK{counter[0]}"
+        if display:
+            placeholders[key] = f"\\[{match.group(1)}\\]"
+        else:
+            placeholders[key] = f"\\({match.group(1)}\\)"
+        return key
+
+    protected = re.sub(r'\$\$(.+?)\$\$', lambda m: _placeholder(m, True), content, flags=re.DOTALL)
+    protected = re.sub(r'\$(?!\$)([^$\n]*?\\[^$\n]*?)\$', _placeholder, protected)
+    protected = re.sub(r'\$(?!\$)([a-zA-Z][^$\n]{0,8}?)\$', _placeholder, protected)
+    protected = re.sub(r'\\\[(.+?)\\\]', lambda m: _placeholder(m, True), protected, flags=re.DOTALL)
+    protected = re.sub(r'\\\((.+?)\\\)', _placeholder, protected)
+    return protected, placeholders
+
+
+def legacy_restore_math(html, placeholders):
+    for key in sorted(placeholders, key=len, reverse=True):
+        html = html.replace(key, placeholders[key])
+    return html
+
+
+def legacy_markdownify_with_math(content):
+    protected, placeholders = legacy_protect_math(content)
+    return legacy_restore_math(markdownify(protected), placeholders)
+
+
+FORMULAS = [
+    '$x_i$', '$k$', r'$\frac{a}{b}$', r'$\sum_{i=1}^{n} x_i^2$', r'$\alpha + \beta$',
+    '$$E = mc^2$$', '$$\n\\int_0^1 f(x)\\,dx\n$$', r'\(a^2 + b^2\)', '\\[\n\\nabla \\cdot E = 0\n\\]',
+]
+PROSE = [
+    'The pool charged $100 in fees', 'while $HACHI traded flat.', 'Liquidity moved',
+    'so the **ratio** changed', 'as shown in _figure 2_', 'and the price is $5.',
+]
+# Tricky inputs and the HTML the scanner must produce for them. The first
+# three are rendered exactly as the legacy chain did. The rest are nested or
+# overlapping spans, where the scanner intentionally differs (see
+# ``blog.rendering._MathScanner``). The legacy chain leaked placeholders such
+# as ``MATHBLOCK1`` into the page, or let a later-opening span cut into an
+# earlier one.
+EDGE_CASES = [
+    (r'Set $n$ where \(n\) is $$n^2$$',
+     r'<p>Set \(n\) where \(n\) is \[n^2\]</p>'),
+    (r'Let $k$ be the rate, so \alpha grows and $$k = 1$$ holds.',
+     r'<p>Let \(k\) be the rate, so \alpha grows and \[k = 1\] holds.</p>'),
+    (r'Costs $a$$b\c$ and $$d$$',
+     r'<p>Costs $a\[b\c$ and \]d$$</p>'),
+    # Legacy: <p>\(xMATHBLOCK1\frac_1HACHI\)$x</p>
+    (r'$x$$x$$\frac_1HACHI$$x',
+     r'<p>$x\[x\]\frac_1HACHI$$x</p>'),
+    # Legacy: <p>b \n( \[\)# \]</p>
+    ('b \n\\( $$\\)# $$',
+     '<p>b \n\\( $$\\)# $$</p>'),
+    # Legacy: <p>Compare (a \[b\) with c\]</p>
+    (r'Compare \(a \[b\) with c\]',
+     r'<p>Compare \(a \[b\) with c]</p>'),
+]
+
+
+def synthetic_post(formulas, seed=0):
+    """Build a long Markdown post with roughly *formulas* math spans."""
+    rng = random.Random(seed)
+    paragraphs = []
+    for index in range(formulas):
+        words = [rng.choice(PROSE), rng.choice(FORMULAS), rng.choice(PROSE)]
+        paragraphs.append(' '.join(words))
+        if index % 25 == 24:
+            paragraphs.append(f'## Section {index // 25}')
+    return '\n\n'.join(paragraphs)
+
+
+def adversarial_post(size):
+    """Unclosed delimiters that make the lazy DOTALL regexes rescan the document."""
+    return ('$$ a ' * size) + ('\\[ b ' * size) + ('$x ' * size)
+
+
+class Command(BaseCommand):
+    help = 'Compare the single-pass math scanner with the legacy regex chain.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formulas', type=int, default=3000, help='Math spans in the synthetic post')
+        parser.add_argument('--adversarial', type=int, default=3000, help='Unclosed delimiters in the adversarial post')
+        parser.add_argument('--repeat', type=int, default=3, help='Timing repetitions (best is reported)')
+
+    def _time(self, func, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        post = synthetic_post(options['formulas'])
+
+        legacy_html = legacy_markdownify_with_math(post)
+        html = markdownify_with_math(post)
+        if html != legacy_html:
+            raise CommandError('Scanner output differs from the legacy implementation.')
+        for content, expected in EDGE_CASES:
+            if markdownify_with_math(content) != expected:
+                raise CommandError(f'Scanner output for edge case {content!r} changed.')
+
+        protected, spans = protect_math(post)
+        legacy_protected, placeholders = legacy_protect_math(post)
+        rendered = markdownify(protected)
+        replacements = delimit_math(spans)
+
+        rows = [
+            ('protect', lambda: legacy_protect_math(post), lambda: protect_math(post)),
+            ('restore', lambda: legacy_restore_math(rendered, placeholders), lambda: restore_math(rendered, replacements)),
+            ('full render', lambda: legacy_markdownify_with_math(post), lambda: markdownify_with_math(post)),
+        ]
+        adversarial = adversarial_post(options['adversarial'])
+        rows.append(('adversarial', lambda: legacy_protect_math(adversarial), lambda: protect_math(adversarial)))
+
+        self.stdout.write(
+            f'Synthetic post: {len(post):,} chars, {len(spans):,} math spans; '
+            f'adversarial post: {len(adversarial):,} chars'
+        )
+        self.stdout.write(f"{'phase':<14}{'legacy (ms)':>14}{'scanner (ms)':>14}{'speedup':>10}")
+        for label, legacy, current in rows:
+            legacy_time = self._time(legacy, repeat)
+            current_time = self._time(current, repeat)
+            self.stdout.write(
+                f'{label:<14}{legacy_time * 1000:>14.2f}{current_time * 1000:>14.2f}'
+                f'{legacy_time / current_time:>9.1f}x'
+            )
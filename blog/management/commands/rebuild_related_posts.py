@@ -0,0 +1,41 @@
+"""
+Bring the related-posts index used by the blog post sidebar up to date.
+
+Re-extracts the content terms of posts whose terms are stale (e.g. after
+the term extraction changed) and refreshes just those posts' entries.
+The whole index is recomputed only with ``--all``, which is quadratic in
+the number of published posts, or when it is empty, as after the
+migration that creates it. Runs on every deploy after ``migrate``.
+
+Usage:
+    python manage.py rebuild_related_posts
+    python manage.py rebuild_related_posts --all
+"""
+from django.core.management.base import BaseCommand
+
+from blog.models import RelatedPost, rebuild_related_posts, refresh_related_posts, update_content_terms
+
+
+class Command(BaseCommand):
+    help = 'Update stale content terms and the related-posts index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Recompute the whole index (e.g. after bulk edits to categories or tags)',
+        )
+
+    def handle(self, *args, **options):
+        stale = update_content_terms()
+        if options['all'] or not RelatedPost.objects.exists():
+            rebuild_related_posts()
+            action = 'rebuilt the index'
+        elif stale:
+            refresh_related_posts(stale)
+            action = 'refreshed their entries'
+        else:
+            action = 'index unchanged'
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated terms for {len(stale)} post(s); {action}; '
+            f'{RelatedPost.objects.count()} related-post link(s).'
+        ))
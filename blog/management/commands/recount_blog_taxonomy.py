@@ -0,0 +1,19 @@
+"""
+Recompute the published post counts shown in the blog sidebar.
+
+Usage:
+    python manage.py recount_blog_taxonomy
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.models import recount_published_post_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute published_post_count for all blog categories and tags.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recount_published_post_counts()
+        self.stdout.write(self.style.SUCCESS('Blog category and tag counts recomputed.'))
@@ -0,0 +1,94 @@
+"""
+Server-side math rendering for blog posts.
+
+Formulas extracted by ``blog.rendering`` are typeset with KaTeX through a
+single Node process per post, so pages can ship the KaTeX stylesheet only.
+Each rendered formula is cached, so re-rendering a post (e.g. after a typo
+fix) only typesets formulas that actually changed.  When Node or the KaTeX
+package is unavailable, ``render_math`` returns ``None`` for every formula
+and the caller falls back to client-side typesetting; such posts are
+re-rendered once ``server_rendering_available`` says KaTeX works again.
+"""
+import hashlib
+import json
+import logging
+import os
+import subprocess
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+logger = logging.getLogger(__name__)
+
+KATEX_SCRIPT = os.path.join(os.path.dirname(__file__), 'katex_render.js')
+
+# Bump to invalidate cached formula renders (e.g. after upgrading KaTeX).
+CACHE_VERSION = 1
+
+# After a failed Node run, posts are not re-rendered to retry it for this long.
+FAILURE_KEY = 'blog:katex:failed'
+RETRY_AFTER = 300
+
+
+def _cache_key(tex, display):
+    digest = hashlib.sha256(f"{int(display)}:{tex}".encode('utf-8')).hexdigest()
+    return f"blog:katex:{CACHE_VERSION}:{digest}"
+
+
+def _render_with_katex(spans):
+    """Typeset ``(tex, display)`` pairs in one Node call; ``None`` on failure."""
+    module = settings.BLOG_KATEX_MODULE
+    if not os.path.isdir(module):
+        logger.warning("KaTeX not found at %s; math will be typeset client-side", module)
+        return None
+    try:
+        result = subprocess.run(
+            [settings.BLOG_KATEX_NODE, KATEX_SCRIPT, module],
+            input=json.dumps(spans),
+            capture_output=True,
+            text=True,
+            timeout=settings.BLOG_KATEX_TIMEOUT,
+            check=True,
+        )
+        rendered = json.loads(result.stdout)
+    except (OSError, subprocess.SubprocessError, ValueError) as error:
+        logger.warning("Server-side KaTeX rendering failed: %s", error)
+        cache.set(FAILURE_KEY, True, RETRY_AFTER)
+        return None
+    if not isinstance(rendered, list) or len(rendered) != len(spans):
+        logger.warning("Unexpected output from KaTeX renderer")
+        cache.set(FAILURE_KEY, True, RETRY_AFTER)
+        return None
+    return rendered
+
+
+def server_rendering_available():
+    """True if math is configured to be, and can currently be, typeset on the server."""
+    return (
+        settings.BLOG_MATH_RENDERER == 'katex'
+        and os.path.isdir(settings.BLOG_KATEX_MODULE)
+        and not cache.get(FAILURE_KEY)
+    )
+
+
+def render_math(spans):
+    """Return rendered HTML for each ``(tex, display)`` pair, or ``None`` where unavailable."""
+    if settings.BLOG_MATH_RENDERER != 'katex':
+        return [None] * len(spans)
+
+    keys = [_cache_key(tex, display) for tex, display in spans]
+    cached = cache.get_many(set(keys))
+    missing = {}
+    for key, span in zip(keys, spans):
+        if key not in cached:
+            missing.setdefault(key, span)
+
+    if missing:
+        rendered = _render_with_katex([list(span) for span in missing.values()])
+        if rendered is not None:
+            fresh = {key: markup for key, markup in zip(missing, rendered) if markup is not None}
+            cache.set_many(fresh, timeout=None)
+            cached.update(fresh)
+
+    return [cached.get(key) for key in keys]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.28 on 2026-10-17 11:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_blogpost_rendered_content'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='content_manifest',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
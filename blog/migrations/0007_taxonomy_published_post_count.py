@@ -0,0 +1,52 @@
+# Generated by Django 4.2.28 on 2026-10-17 11:55
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_published_post_counts(apps, schema_editor):
+    """Backfill the counters for posts that already exist."""
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    for model_name, field in (('BlogCategory', 'categories'), ('BlogTag', 'tags')):
+        model = apps.get_model('blog', model_name)
+        through = BlogPost._meta.get_field(field).remote_field.through
+        target = f'{model._meta.model_name}_id'
+        counts = (
+            through.objects
+            .filter(**{target: OuterRef('pk'), 'blogpost__published': True})
+            .order_by()
+            .values(target)
+            .annotate(count=Count('pk'))
+            .values('count')
+        )
+        model.objects.update(published_post_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_blogpost_content_manifest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogcategory',
+            name='published_post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='blogtag',
+            name='published_post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='blogcategory',
+            index=models.Index(fields=['-published_post_count', 'name'], name='blog_category_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blogtag',
+            index=models.Index(fields=['-published_post_count', 'name'], name='blog_tag_count_idx'),
+        ),
+        migrations.RunPython(populate_published_post_counts, migrations.RunPython.noop),
+    ]
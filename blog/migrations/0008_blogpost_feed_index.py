@@ -0,0 +1,17 @@
+# Generated by Django 4.2.28 on 2026-10-17 11:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_taxonomy_published_post_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['published', '-created_date', '-id'], name='blog_post_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.28 on 2026-10-17 12:05
+
+import re
+
+from django.db import migrations
+from django.utils.html import strip_tags
+
+
+# Frozen copies of blog.search as of this migration, so later changes to
+# the app's search code don't change what this migration does.
+FTS_TABLE = 'blog_blogpost_fts'
+
+IMAGE_RE = re.compile(r'!\[([^\]]*)\]\([^)]*\)')
+LINK_RE = re.compile(r'\[([^\]]*)\]\([^)]*\)')
+MARKUP_RE = re.compile(r'[#*_>`~|$\\]+')
+SPACE_RE = re.compile(r'\s+')
+
+
+def plain_text(markdown):
+    text = IMAGE_RE.sub(r'\1', markdown)
+    text = LINK_RE.sub(r'\1', text)
+    text = MARKUP_RE.sub(' ', strip_tags(text))
+    return SPACE_RE.sub(' ', text).strip()
+
+
+def create_fts_table(apps, schema_editor):
+    """Create and fill the FTS5 index (SQLite only; other databases search with LIKE)."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            "title, excerpt, body, tokenize = 'porter unicode61 remove_diacritics 2', prefix = '3 4')"
+        )
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, excerpt, body) VALUES (%s, %s, %s, %s)',
+            [
+                [pk, title, excerpt, plain_text(content)]
+                for pk, title, excerpt, content in BlogPost.objects.values_list('pk', 'title', 'excerpt', 'content')
+            ],
+        )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_related_posts_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
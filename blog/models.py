@@ -1,8 +1,17 @@
-from django.db import models
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db import models, transaction
+from django.db.models import Count, Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.utils.text import slugify
 from markdownx.models import MarkdownxField
 
+from .related import MIN_SCORE, RELATED_POSTS_STORED, extract_terms, load_features, related_rows, score_pair
+from .rendering import RENDERER_VERSION, awaits_server_math, content_hash, render_content, required_assets
+
 
 def get_default_author():
     """Get default author name from site configuration."""
@@ -25,14 +34,72 @@ class BlogPost(models.Model):
     updated_date = models.DateTimeField(auto_now=True)
     published = models.BooleanField(default=False)
     
+    # Rendered HTML of ``content``, regenerated whenever the Markdown source or
+    # the renderer changes (see ``blog.rendering``).
+    content_html = models.TextField(blank=True, editable=False)
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+    renderer_version = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Features the rendered HTML uses (math, code, tables, images); see
+    # ``blog.rendering.render_content``.
+    content_manifest = models.JSONField(default=dict, blank=True, editable=False)
+    # Weighted content terms for related-post scoring (see ``blog.related``).
+    content_terms = models.JSONField(default=dict, blank=True, editable=False)
+    
     class Meta:
         ordering = ['-created_date']
+        indexes = [
+            # Serves the published list ordering and its keyset cursors. Partial
+            # because SQLite can't match a bare `WHERE published` against a
+            # leading `published` column, which left ORDER BY in a temp B-tree.
+            models.Index(
+                fields=['-created_date', '-id'],
+                condition=models.Q(published=True),
+                name='blog_post_feed_idx',
+            ),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
+        if self.refresh_rendered_content():
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {
+                    'content_html', 'content_hash', 'renderer_version', 'content_manifest',
+                    'content_terms',
+                }
         super().save(*args, **kwargs)
     
+    def refresh_rendered_content(self):
+        """Re-render ``content_html`` if it is stale. Returns True if it was re-rendered."""
+        digest = content_hash(self.content)
+        if (digest == self.content_hash and self.renderer_version == RENDERER_VERSION
+                and not awaits_server_math(self.content_manifest)):
+            return False
+        self.content_html, self.content_manifest = render_content(self.content)
+        self.content_terms = extract_terms(self.content)
+        self.content_hash = digest
+        self.renderer_version = RENDERER_VERSION
+        return True
+    
+    @property
+    def required_assets(self):
+        """Names of the stylesheets ``content_html`` needs (see blog/content_assets.html)."""
+        return required_assets(self.content_manifest)
+    
+    def get_content_html(self):
+        """Return the rendered HTML, re-rendering and persisting it first if stale."""
+        if self.refresh_rendered_content() and self.pk:
+            # Persist without touching updated_date: a re-render is not an edit.
+            BlogPost.objects.filter(pk=self.pk).update(
+                content_html=self.content_html,
+                content_hash=self.content_hash,
+                renderer_version=self.renderer_version,
+                content_manifest=self.content_manifest,
+                content_terms=self.content_terms,
+            )
+        return self.content_html
+    
     def __str__(self):
         return self.title
 
@@ -41,9 +108,14 @@ class BlogCategory(models.Model):
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=100, unique=True, blank=True)
     description = models.TextField(blank=True)
+    # Maintained by blog.signals; repair with `manage.py recount_blog_taxonomy`.
+    published_post_count = models.PositiveIntegerField(default=0, editable=False)
     
     class Meta:
         verbose_name_plural = "Blog Categories"
+        indexes = [
+            models.Index(fields=['-published_post_count', 'name'], name='blog_category_count_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -57,6 +129,13 @@ class BlogCategory(models.Model):
 class BlogTag(models.Model):
     name = models.CharField(max_length=50, unique=True)
     slug = models.SlugField(max_length=50, unique=True, blank=True)
+    # Maintained by blog.signals; repair with `manage.py recount_blog_taxonomy`.
+    published_post_count = models.PositiveIntegerField(default=0, editable=False)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['-published_post_count', 'name'], name='blog_tag_count_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -70,3 +149,127 @@ class BlogTag(models.Model):
 # Update BlogPost to include categories and tags
 BlogPost.add_to_class('categories', models.ManyToManyField(BlogCategory, blank=True, related_name='posts'))
 BlogPost.add_to_class('tags', models.ManyToManyField(BlogTag, blank=True, related_name='posts'))
+
+
+class RelatedPost(models.Model):
+    """Precomputed related-posts index, maintained by blog.signals.
+
+    Holds the best ``RELATED_POSTS_STORED`` matches for each published post;
+    rebuild it with ``manage.py rebuild_related_posts --all``.
+    """
+    post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    
+    class Meta:
+        ordering = ['-score']
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'related'], name='blog_relatedpost_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['post', '-score'], name='blog_relatedpost_rank_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.post} -> {self.related} ({self.score})"
+
+
+def recount_published_post_counts():
+    """Recompute ``published_post_count`` for every category and tag in bulk."""
+    for model, field in ((BlogCategory, 'categories'), (BlogTag, 'tags')):
+        through = getattr(BlogPost, field).through
+        target = f'{model._meta.model_name}_id'
+        counts = (
+            through.objects
+            .filter(**{target: OuterRef('pk'), 'blogpost__published': True})
+            .order_by()
+            .values(target)
+            .annotate(count=Count('pk'))
+            .values('count')
+        )
+        model.objects.update(published_post_count=Coalesce(Subquery(counts), 0))
+
+
+def filter_posts_by_taxonomy(queryset, category_slugs=(), tag_slugs=()):
+    """Keep posts in any of the given categories *or* tags.
+
+    Each taxonomy becomes a correlated ``EXISTS`` on its through table
+    rather than a join, so a post matching several slugs is still one row:
+    no ``DISTINCT`` (and no temp B-tree to de-duplicate) is needed and the
+    list ordering can be read straight off ``blog_post_feed_idx``.
+
+    ``blog_list`` filters with the facet index (``blog.facets``) instead;
+    this is the SQL form of the same filter, kept as the reference the
+    index is tested against and for callers that need a queryset, such
+    as ``benchmark_blog_filters``.
+    """
+    conditions = []
+    if category_slugs:
+        conditions.append(Exists(BlogPost.categories.through.objects.filter(
+            blogpost_id=OuterRef('pk'), blogcategory__slug__in=category_slugs,
+        )))
+    if tag_slugs:
+        conditions.append(Exists(BlogPost.tags.through.objects.filter(
+            blogpost_id=OuterRef('pk'), blogtag__slug__in=tag_slugs,
+        )))
+    if not conditions:
+        return queryset
+    return queryset.filter(reduce(or_, conditions))
+
+
+def refresh_related_posts(post_pks):
+    """Update the related-posts index after the given posts changed.
+
+    Only the changed posts' lists and the lists they enter or leave are
+    recomputed, so a save costs one pass over the published posts rather
+    than a full rebuild.
+    """
+    changed = set(post_pks)
+    features = load_features(BlogPost)
+    current = defaultdict(list)
+    for post_id, related_id, score in RelatedPost.objects.values_list('post_id', 'related_id', 'score'):
+        current[post_id].append((related_id, score))
+    
+    affected = set(changed)
+    for pk in set(features) | set(current):
+        if pk in affected:
+            continue
+        entries = current.get(pk, [])
+        if pk not in features or any(related_id in changed for related_id, _ in entries):
+            affected.add(pk)
+            continue
+        floor = min(score for _, score in entries) if len(entries) >= RELATED_POSTS_STORED else MIN_SCORE
+        if any(other in features and score_pair(features[pk], features[other]) >= floor for other in changed):
+            affected.add(pk)
+    
+    rows = [
+        RelatedPost(post_id=pk, related_id=related_pk, score=score)
+        for pk, related_pk, score in related_rows(affected, features)
+    ]
+    with transaction.atomic():
+        RelatedPost.objects.filter(post_id__in=affected).delete()
+        RelatedPost.objects.bulk_create(rows)
+
+
+def update_content_terms():
+    """Re-extract ``content_terms`` where they are stale; return the pks of the posts updated."""
+    stale = []
+    for post in BlogPost.objects.only('pk', 'content', 'content_terms'):
+        terms = extract_terms(post.content)
+        if terms != post.content_terms:
+            post.content_terms = terms
+            stale.append(post)
+    BlogPost.objects.bulk_update(stale, ['content_terms'], batch_size=200)
+    return [post.pk for post in stale]
+
+
+def rebuild_related_posts():
+    """Recompute the whole related-posts index (quadratic in the published posts)."""
+    features = load_features(BlogPost)
+    rows = [
+        RelatedPost(post_id=pk, related_id=related_pk, score=score)
+        for pk, related_pk, score in related_rows(features, features)
+    ]
+    with transaction.atomic():
+        RelatedPost.objects.all().delete()
+        RelatedPost.objects.bulk_create(rows)
@@ -0,0 +1,74 @@
+"""
+Keyset (cursor) pagination for the blog list.
+
+Pages are addressed by the ``(created_date, id)`` of the boundary post
+rather than by page number, so a page costs the same however deep into
+the archive the reader goes (``blog.facets`` resolves cursors to
+positions in its index).
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+
+class CursorPage:
+    """One page of posts plus opaque cursors for its neighbours.
+
+    Quacks enough like ``django.core.paginator.Page`` (iteration, ``len``,
+    ``has_next``/``has_previous``/``has_other_pages``) for the list template.
+    """
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.total_count = None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next:
+            return encode_cursor(self.object_list[-1], 'next')
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous:
+            return encode_cursor(self.object_list[0], 'prev')
+        return None
+
+
+def encode_cursor(post, direction):
+    payload = json.dumps([post.created_date.isoformat(), post.pk, direction])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return ``(created_date, pk, direction)``, or ``None`` for a bad cursor."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created, pk, direction = json.loads(base64.urlsafe_b64decode(padded))
+        created = datetime.fromisoformat(created)
+        pk = int(pk)
+    except (binascii.Error, TypeError, ValueError):
+        return None
+    if direction not in ('next', 'prev'):
+        return None
+    return created, pk, direction
@@ -0,0 +1,106 @@
+"""
+Scoring for the precomputed related-posts index.
+
+Posts are compared on shared categories, shared tags and the cosine
+similarity of their content terms. The functions here are pure so the
+same scoring serves incremental updates (``blog.models.refresh_related_posts``)
+and full rebuilds (``blog.models.rebuild_related_posts``).
+"""
+import math
+import re
+from collections import Counter, namedtuple
+
+
+# How many related posts are stored per post; blog_detail shows the top 3.
+RELATED_POSTS_STORED = 6
+
+CATEGORY_WEIGHT = 2.0
+TAG_WEIGHT = 1.0
+TERMS_WEIGHT = 3.0
+# Pairs scoring below this are not worth recommending.
+MIN_SCORE = 0.1
+
+# Terms kept per post; enough to characterise a post without bloating rows.
+MAX_TERMS = 40
+
+_WORD_RE = re.compile(r"[a-z][a-z0-9]{2,}")
+_CODE_RE = re.compile(r"^(`{3,}|~{3,}).*?^\1", re.MULTILINE | re.DOTALL)
+_URL_RE = re.compile(r"\(\s*(?:https?://|/)[^)]*\)|https?://\S+")
+
+STOP_WORDS = frozenset("""
+    about above after again against all also and any are because been before being below between both
+    but can could did does doing down during each few for from further had has have having her here
+    hers him his how into its itself just let more most much must not now off once only other our
+    ours out over own same she should some such than that the their theirs them then there these they
+    this those through too under until very was way were what when where which while who whom why will
+    with would you your yours use used using one two may might like get make made well even
+""".split())
+
+
+Features = namedtuple('Features', 'categories tags terms created')
+
+
+def extract_terms(content):
+    """Return the post's characteristic terms as an L2-normalised ``{term: weight}``.
+
+    Fenced code and URLs are dropped; weights are sub-linear term
+    frequencies of the ``MAX_TERMS`` most frequent non-stop-words.
+    """
+    text = _URL_RE.sub(' ', _CODE_RE.sub(' ', content)).lower()
+    counts = Counter(word for word in _WORD_RE.findall(text) if word not in STOP_WORDS)
+    weights = {term: 1 + math.log(count) for term, count in counts.most_common(MAX_TERMS)}
+    norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+    if not norm:
+        return {}
+    return {term: round(weight / norm, 4) for term, weight in weights.items()}
+
+
+def score_pair(a, b):
+    """Relatedness of two posts' :class:`Features` (symmetric)."""
+    score = CATEGORY_WEIGHT * len(a.categories & b.categories) + TAG_WEIGHT * len(a.tags & b.tags)
+    small, large = (a.terms, b.terms) if len(a.terms) <= len(b.terms) else (b.terms, a.terms)
+    score += TERMS_WEIGHT * sum(weight * large.get(term, 0.0) for term, weight in small.items())
+    return round(score, 4)
+
+
+def rank_related(pk, features, limit=RELATED_POSTS_STORED):
+    """Return ``[(related_pk, score), ...]`` for post ``pk``, best first.
+
+    ``features`` maps every candidate post pk to its :class:`Features`.
+    Ties go to the more recent post.
+    """
+    own = features[pk]
+    scored = []
+    for other_pk, other in features.items():
+        if other_pk == pk:
+            continue
+        score = score_pair(own, other)
+        if score >= MIN_SCORE:
+            scored.append((score, other.created, other_pk))
+    scored.sort(reverse=True)
+    return [(other_pk, score) for score, _created, other_pk in scored[:limit]]
+
+
+def load_features(post_model):
+    """Return ``{pk: Features}`` for every published post (three queries)."""
+    features = {
+        pk: Features(set(), set(), terms or {}, created)
+        for pk, created, terms in post_model.objects.filter(published=True)
+        .values_list('pk', 'created_date', 'content_terms')
+    }
+    for name in ('categories', 'tags'):
+        field = post_model._meta.get_field(name)
+        through = field.remote_field.through
+        target = f'{field.m2m_reverse_field_name()}_id'
+        links = through.objects.filter(blogpost__published=True).values_list('blogpost_id', target)
+        for post_id, target_id in links:
+            getattr(features[post_id], name).add(target_id)
+    return features
+
+
+def related_rows(pks, features):
+    """Yield ``(post_pk, related_pk, score)`` index rows for the given posts."""
+    for pk in pks:
+        if pk in features:
+            for related_pk, score in rank_related(pk, features):
+                yield pk, related_pk, score
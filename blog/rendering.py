@@ -0,0 +1,440 @@
+"""
+Markdown rendering pipeline for blog posts.
+
+Rendering is comparatively expensive (a math scan plus a full
+Python-Markdown run), so the result is stored on ``BlogPost`` and only
+regenerated when the content hash or ``RENDERER_VERSION`` changes, or when
+math left to the browser could now be typeset on the server.
+"""
+import hashlib
+import re
+from bisect import bisect_right
+
+import markdown
+from django.conf import settings
+from markdownx.utils import markdownify
+
+from .math_rendering import render_math, server_rendering_available
+
+try:
+    import pygments
+except ImportError:  # codehilite falls back to unhighlighted <pre><code>
+    pygments = None
+
+
+# Bump whenever the HTML produced by ``render_content`` changes so that stored
+# renders are regenerated on next access.
+RENDERER_VERSION = 5
+
+
+def content_hash(content):
+    """Return a stable hex digest of the Markdown source."""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class _Finder:
+    """Memoised ``str.find`` for scans whose start position rarely moves backwards.
+
+    As long as successive calls use non-decreasing start positions each
+    occurrence is located once, which keeps the whole scan linear even on
+    adversarial input (e.g. thousands of unclosed delimiters).
+    """
+
+    __slots__ = ('text', 'needle', 'start', 'found')
+
+    def __init__(self, text, needle):
+        self.text = text
+        self.needle = needle
+        self.start = None
+        self.found = -1
+
+    def next(self, start):
+        """Return the index of the first occurrence at or after *start*, or -1."""
+        if self.start is None or start < self.start or 0 <= self.found < start:
+            self.found = self.text.find(self.needle, start)
+            self.start = start
+        return self.found
+
+
+# Special characters the scanner stops at: ``$``, ``\[``/``\(`` and backtick runs.
+_SPECIAL_RE = re.compile(r'\$|\\[\[(]|`+')
+_BACKTICKS_RE = re.compile(r'`+')
+# Fence lines as understood by ``markdown.extensions.fenced_code``: the fence
+# must start the line and the closing fence must repeat it exactly.
+_FENCE_LINE_RE = re.compile(r'^(?P<fence>`{3,}|~{3,})(?P<info>[^\n]*)', re.MULTILINE)
+_FENCE_INFO_RE = re.compile(
+    r'[ ]*(?:\{(?P<attrs>[^\n]*)\}|(?:\.?(?P<lang>[\w#.+-]*)[ ]*)?'
+    r'(?:hl_lines=(?P<quot>["\']).*?(?P=quot)[ ]*)?)$'
+)
+_ATTRS_LANG_RE = re.compile(r'(?:^|\s)\.([\w#.+-]+)')
+_PLACEHOLDER_RE = re.compile(r'MATHBLOCK(\d+)')
+
+# Span kinds, in the order the original multi-pass implementation numbered them.
+_DISPLAY_DOLLARS, _INLINE_BACKSLASH, _INLINE_SHORT, _DISPLAY_BRACKETS, _INLINE_PARENS = range(5)
+_DISPLAY_KINDS = (_DISPLAY_DOLLARS, _DISPLAY_BRACKETS)
+
+
+def _fence_blocks(text):
+    """Return ``(blocks, languages)`` for the fenced code blocks in *text*.
+
+    ``blocks`` holds sorted ``(start, end)`` spans; ``languages`` the language
+    named on each block's opening fence, if any.
+    """
+    lines = list(_FENCE_LINE_RE.finditer(text))
+    closers = {}
+    for index, line in enumerate(lines):
+        if not line.group('info').strip(' '):
+            closers.setdefault(line.group('fence'), []).append(index)
+
+    blocks = []
+    languages = []
+    pointers = {}
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        fence = line.group('fence')
+        candidates = closers.get(fence, ())
+        # Advance this fence's closer pointer past the opener.
+        pointer = pointers.get(fence, 0)
+        while pointer < len(candidates) and candidates[pointer] <= index:
+            pointer += 1
+        pointers[fence] = pointer
+        info = _FENCE_INFO_RE.match(line.group('info'))
+        if pointer < len(candidates) and line.end() < len(text) and info:
+            closer = lines[candidates[pointer]]
+            blocks.append((line.start(), closer.end()))
+            if info.group('attrs') is not None:
+                attrs_lang = _ATTRS_LANG_RE.search(info.group('attrs'))
+                languages.append(attrs_lang.group(1) if attrs_lang else None)
+            else:
+                languages.append(info.group('lang') or None)
+            index = candidates[pointer] + 1
+        else:
+            index += 1
+    return blocks, languages
+
+
+class _MathScanner:
+    """Single left-to-right scan that swaps math spans for placeholders.
+
+    Code fences and inline code spans are copied through untouched; math
+    spans are replaced by ``MATHBLOCK<n>`` keys and collected in ``spans`` as
+    ``(tex, display)`` pairs.  The delimiter rules are the historical ones:
+
+    * ``$$…$$`` (may span lines) and ``\\[…\\]`` are display math;
+    * ``$…$`` on one line is inline math if it contains a backslash, or is
+      1-9 characters starting with a letter (so ``$100`` and ``$HACHI`` are
+      left alone while ``$x_i$`` is math);
+    * ``\\(…\\)`` on one line is inline math.
+
+    Spans never nest or overlap: the first one to open wins and any
+    delimiters inside it are part of its TeX. The legacy regex chain ran one
+    pass per delimiter kind instead, so on such input it could let a later
+    span cut into an earlier one, or leave a ``MATHBLOCK`` placeholder inside
+    another span. Those cases are listed in ``benchmark_markdown.EDGE_CASES``.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.spans = []
+        self.blocks, self.languages = _fence_blocks(text)
+        self.block_starts = [start for start, _ in self.blocks]
+        self.dollar = _Finder(text, '$')
+        self.dollar_ahead = _Finder(text, '$')
+        self.newline = _Finder(text, '\n')
+        self.newline_ahead = _Finder(text, '\n')
+        self.backslash = _Finder(text, '\\')
+        self.backslash_ahead = _Finder(text, '\\')
+        self.display_close = _Finder(text, '$$')
+        self.display_close_ahead = _Finder(text, '$$')
+        self.bracket_close = _Finder(text, '\\]')
+        self.paren_close = _Finder(text, '\\)')
+        self.runs_end = -1
+        self.runs = {}
+
+    def _outside_fences(self, finder, start):
+        """Find ``finder.needle`` at/after *start*, skipping fenced code blocks."""
+        while True:
+            found = finder.next(start)
+            if found < 0:
+                return -1
+            index = bisect_right(self.block_starts, found) - 1
+            if index >= 0 and found < self.blocks[index][1]:
+                start = self.blocks[index][1]
+                continue
+            return found
+
+    def _inline_close(self, i):
+        """Return ``(closing index, kind)`` of an inline ``$`` span opened at *i*."""
+        text = self.text
+        if i + 1 >= len(text) or text[i + 1] == '$':
+            return -1, None
+        j = self.dollar.next(i + 1)
+        if j < 0:
+            return -1, None
+        line_end = self.newline.next(i + 1)
+        if 0 <= line_end < j:
+            return -1, None
+        if 0 <= self.backslash.next(i + 1) < j:
+            kind = _INLINE_BACKSLASH
+        elif text[i + 1].isascii() and text[i + 1].isalpha() and j - i - 1 <= 9:
+            kind = _INLINE_SHORT
+        else:
+            return -1, None
+        # A ``$$`` that opens display math is never the end of an inline span.
+        if text.startswith('$$', j) and self._outside_fences(self.display_close, j + 3) >= 0:
+            return -1, None
+        if kind == _INLINE_SHORT and self._inline_close_ahead(j) >= 0:
+            # The closing ``$`` opens a backslash span instead: those win.
+            return -1, None
+        return j, kind
+
+    def _inline_close_ahead(self, j):
+        """Like ``_inline_close`` for backslash spans, using look-ahead finders."""
+        text = self.text
+        if j + 1 >= len(text) or text[j + 1] == '$':
+            return -1
+        k = self.dollar_ahead.next(j + 1)
+        if k < 0:
+            return -1
+        line_end = self.newline_ahead.next(j + 1)
+        if 0 <= line_end < k:
+            return -1
+        # A ``$$`` opening display math is replaced before inline spans are
+        # looked for, so it cannot close one either.
+        if text.startswith('$$', k) and self._outside_fences(self.display_close_ahead, k + 3) >= 0:
+            return -1
+        return k if 0 <= self.backslash_ahead.next(j + 1) < k else -1
+
+    def _code_span_close(self, i, length):
+        """Return the start of the run closing a code span opened at *i*, or -1."""
+        if i >= self.runs_end:
+            line_end = self.newline.next(i)
+            self.runs_end = len(self.text) if line_end < 0 else line_end
+            self.runs = {}
+            for run in _BACKTICKS_RE.finditer(self.text, i, self.runs_end):
+                self.runs.setdefault(run.end() - run.start(), []).append(run.start())
+        starts = self.runs.get(length, ())
+        index = bisect_right(starts, i)
+        return starts[index] if index < len(starts) else -1
+
+    def _escaped(self, i):
+        """True if the character at *i* is preceded by an odd number of backslashes."""
+        count = 0
+        while i - count > 0 and self.text[i - count - 1] == '\\':
+            count += 1
+        return count % 2 == 1
+
+    def protect(self):
+        """Return the text with every math span replaced by its placeholder."""
+        text = self.text
+        out = []
+        found = []
+        last = pos = 0
+        block = 0
+        while True:
+            match = _SPECIAL_RE.search(text, pos)
+            while block < len(self.blocks) and self.blocks[block][1] <= pos:
+                block += 1
+            if block < len(self.blocks) and (match is None or self.blocks[block][0] <= match.start()):
+                pos = self.blocks[block][1]
+                block += 1
+                continue
+            if match is None:
+                break
+
+            i = match.start()
+            token = match.group()
+            end = -1
+            if token == '$':
+                if text.startswith('$$', i):
+                    close = self._outside_fences(self.display_close, i + 3)
+                    if close >= 0:
+                        inner, kind, end = text[i + 2:close], _DISPLAY_DOLLARS, close + 2
+                else:
+                    close, kind = self._inline_close(i)
+                    if close >= 0:
+                        inner, end = text[i + 1:close], close + 1
+            elif token == '\\[':
+                close = self._outside_fences(self.bracket_close, i + 3)
+                if close >= 0:
+                    inner, kind, end = text[i + 2:close], _DISPLAY_BRACKETS, close + 2
+            elif token == '\\(':
+                close = self.paren_close.next(i + 3)
+                line_end = self.newline.next(i + 2)
+                if close >= 0 and not 0 <= line_end < close:
+                    inner, kind, end = text[i + 2:close], _INLINE_PARENS, close + 2
+            else:
+                if self._escaped(i):
+                    pos = i + 1
+                    continue
+                close = self._code_span_close(i, len(token))
+                pos = close + len(token) if close >= 0 else i + len(token)
+                continue
+
+            if end < 0:
+                pos = i + 1
+                continue
+            out.append(text[last:i])
+            out.append(None)
+            found.append((kind, inner))
+            last = pos = end
+        out.append(text[last:])
+
+        # Number spans kind by kind, in document order within each kind, so
+        # placeholder keys (and heading ids derived from them) are stable.
+        order = sorted(range(len(found)), key=lambda index: found[index][0])
+        keys = [None] * len(found)
+        for number, index in enumerate(order, 1):
+            kind, inner = found[index]
+            keys[index] = f"MATHBLOCK{number}"
+            self.spans.append((inner, kind in _DISPLAY_KINDS))
+        placeholders = iter(keys)
+        return ''.join(piece if piece is not None else next(placeholders) for piece in out)
+
+
+def protect_math(content):
+    """Replace math spans with placeholders; return ``(text, spans)``."""
+    scanner = _MathScanner(content)
+    return scanner.protect(), scanner.spans
+
+
+def delimit_math(spans):
+    """Return ``\\[…\\]``/``\\(…\\)`` markup for client-side typesetting."""
+    return [f"\\[{tex}\\]" if display else f"\\({tex}\\)" for tex, display in spans]
+
+
+def restore_math(html, replacements):
+    """Substitute placeholders produced by ``protect_math`` back in one pass.
+
+    ``replacements[n - 1]`` is the markup for placeholder ``MATHBLOCK<n>``.
+    """
+    if not replacements:
+        return html
+
+    def _restore(match):
+        digits = match.group(1)
+        if digits[0] != '0':
+            # Prefer the longest key, as in ``MATHBLOCK12`` vs ``MATHBLOCK1``.
+            for cut in range(len(digits), 0, -1):
+                index = int(digits[:cut])
+                if index <= len(replacements):
+                    return replacements[index - 1] + digits[cut:]
+        return match.group(0)
+
+    return _PLACEHOLDER_RE.sub(_restore, html)
+
+
+def markdownify_with_math(content):
+    """Convert Markdown to HTML while preserving LaTeX math blocks.
+
+    The standard Markdown processor treats backslashes as escape characters
+    and underscores as emphasis markers, which corrupts LaTeX.  Math spans
+    are therefore swapped for unique placeholders before processing and
+    restored afterwards (see ``_MathScanner`` for the delimiter rules).
+
+    Dollar-sign delimiters are converted to ``\\[…\\]`` (display) and
+    ``\\(…\\)`` (inline) so that literal ``$`` in the final HTML is never
+    ambiguous with currency symbols like $100 or $HACHI.  Code fences and
+    inline code are left untouched, so shell snippets like ``$HOME/$x`` are
+    not mistaken for math.
+    """
+    protected, spans = protect_math(content)
+    return restore_math(markdownify(protected), delimit_math(spans))
+
+
+def _server_highlighting():
+    return settings.BLOG_CODE_HIGHLIGHTER == 'pygments' and pygments is not None
+
+
+def _markdown_to_html(text):
+    """Run Python-Markdown with the MarkdownX extensions plus server-side highlighting."""
+    if not _server_highlighting():
+        return markdownify(text)
+    extensions = list(settings.MARKDOWNX_MARKDOWN_EXTENSIONS) + ['markdown.extensions.codehilite']
+    extension_configs = dict(settings.MARKDOWNX_MARKDOWN_EXTENSION_CONFIGS)
+    extension_configs['markdown.extensions.codehilite'] = {
+        'css_class': 'highlight',
+        'guess_lang': False,
+    }
+    return markdown.markdown(text, extensions=extensions, extension_configs=extension_configs)
+
+
+def render_content(content):
+    """Render a post's Markdown source; return ``(html, manifest)``.
+
+    Math is pre-rendered on the server when ``BLOG_MATH_RENDERER`` allows it
+    and code blocks are highlighted with Pygments when
+    ``BLOG_CODE_HIGHLIGHTER`` allows it.  The manifest records which features
+    the post uses, so pages only load the assets they need::
+
+        {
+            'math': {'display': 2, 'inline': 14, 'rendering': 'server'},
+            'code': {'languages': ['python'], 'rendering': 'server'},
+            'tables': True,
+            'images': True,
+        }
+
+    Keys are omitted for features the post does not use; ``rendering`` says
+    whether the browser still has to typeset math / highlight code, and
+    ``math['failed']`` is set when KaTeX was available but rejected a formula.
+    """
+    scanner = _MathScanner(content)
+    protected = scanner.protect()
+    spans = scanner.spans
+    html = _markdown_to_html(protected)
+
+    manifest = {}
+    if spans:
+        rendered = render_math(spans)
+        if all(markup is not None for markup in rendered):
+            rendering = 'server'
+        else:
+            rendering = 'client'
+            fallback = delimit_math(spans)
+            rendered = [markup if markup is not None else fallback[index]
+                        for index, markup in enumerate(rendered)]
+        html = restore_math(html, rendered)
+        display = sum(1 for _, is_display in spans if is_display)
+        manifest['math'] = {
+            'display': display,
+            'inline': len(spans) - display,
+            'rendering': rendering,
+        }
+        if rendering == 'client' and server_rendering_available():
+            # KaTeX ran but rejected some formulas: final for this content
+            manifest['math']['failed'] = True
+    if '<pre' in html:
+        manifest['code'] = {
+            'languages': sorted({lang.lower() for lang in scanner.languages if lang}),
+            'rendering': 'server' if _server_highlighting() else 'client',
+        }
+    if '<table' in html:
+        manifest['tables'] = True
+    if '<img' in html:
+        manifest['images'] = True
+    return html, manifest
+
+
+def awaits_server_math(manifest):
+    """True if the render fell back to client-side math that the server could now typeset.
+
+    Not if KaTeX itself rejected a formula (``failed``): that only changes
+    with the content.
+    """
+    math = manifest.get('math', {})
+    return math.get('rendering') == 'client' and not math.get('failed') and server_rendering_available()
+
+
+def required_assets(manifest):
+    """Return the names of the stylesheets a post's rendered HTML needs.
+
+    Scripts (KaTeX, highlight.js) are loaded on demand by ``base_layout.html``
+    when the page contains content they have to process.
+    """
+    assets = []
+    if 'math' in manifest:
+        assets.append('katex-css')
+    if manifest.get('code', {}).get('rendering') == 'server':
+        assets.append('pygments-css')
+    return assets
@@ -0,0 +1,152 @@
+"""
+Full-text search over blog posts with SQLite FTS5.
+
+``blog_blogpost_fts`` (created by migration 0011) mirrors each post's
+title, excerpt and a plain-text version of its Markdown, keyed by the
+post's id. ``blog.signals`` keeps it in sync on save and delete. On
+databases without FTS5 the search falls back to ``icontains`` filters.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape, strip_tags
+from django.utils.safestring import mark_safe
+
+from .models import BlogPost
+
+
+FTS_TABLE = 'blog_blogpost_fts'
+
+# Weights for bm25() over (title, excerpt, body): a title hit beats a
+# passing mention deep in a long post.
+BM25_WEIGHTS = (10.0, 4.0, 1.0)
+
+# Private-use markers for snippet()/highlight(), swapped for <mark> after
+# the surrounding text is escaped.
+_MARK_OPEN = '\ue000'
+_MARK_CLOSE = '\ue001'
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+_IMAGE_RE = re.compile(r'!\[([^\]]*)\]\([^)]*\)')
+_LINK_RE = re.compile(r'\[([^\]]*)\]\([^)]*\)')
+_MARKUP_RE = re.compile(r'[#*_>`~|$\\]+')
+_SPACE_RE = re.compile(r'\s+')
+
+MAX_QUERY_TERMS = 10
+# Shorter prefixes expand to too many terms to rank quickly; the FTS table
+# keeps prefix indexes for 3 and 4 characters (see migration 0011).
+MIN_PREFIX_LENGTH = 3
+
+_available = {}
+
+
+def fts_available():
+    """Whether the FTS5 table exists on the default database."""
+    key = (connection.alias, connection.settings_dict['NAME'])
+    if not _available.get(key):
+        _available[key] = (
+            connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names(include_views=False)
+        )
+    return _available[key]
+
+
+def plain_text(markdown):
+    """Reduce Markdown to the words a reader sees (alt text, link text, code)."""
+    text = _IMAGE_RE.sub(r'\1', markdown)
+    text = _LINK_RE.sub(r'\1', text)
+    text = _MARKUP_RE.sub(' ', strip_tags(text))
+    return _SPACE_RE.sub(' ', text).strip()
+
+
+def match_query(text):
+    """Turn free text into an FTS5 MATCH expression, or ``None`` if empty.
+
+    Every word must match (implicit AND); the last word also matches as a
+    prefix, once it is ``MIN_PREFIX_LENGTH`` long, so results update while
+    the reader is still typing. Words are quoted, so FTS5 operators and
+    punctuation in the input are inert.
+    """
+    terms = _TERM_RE.findall(text)[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    if len(terms[-1]) >= MIN_PREFIX_LENGTH:
+        quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def index_rows(cursor, rows):
+    """Insert or replace ``(pk, title, excerpt, markdown)`` rows in the FTS table."""
+    rows = list(rows)
+    cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [[row[0]] for row in rows])
+    cursor.executemany(
+        f'INSERT INTO {FTS_TABLE} (rowid, title, excerpt, body) VALUES (%s, %s, %s, %s)',
+        [[pk, title, excerpt, plain_text(content)] for pk, title, excerpt, content in rows],
+    )
+
+
+def index_post(post):
+    if fts_available():
+        with connection.cursor() as cursor:
+            index_rows(cursor, [(post.pk, post.title, post.excerpt, post.content)])
+
+
+def unindex_post(pk):
+    if fts_available():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+
+
+def _marked(text):
+    return mark_safe(escape(text).replace(_MARK_OPEN, '<mark>').replace(_MARK_CLOSE, '</mark>'))
+
+
+def search_posts(text, limit=20):
+    """Return ``[(post_id, title_html, snippet_html), ...]`` for published posts, best first.
+
+    ``title_html`` and ``snippet_html`` are escaped with matches wrapped in
+    ``<mark>``.
+    """
+    query = match_query(text)
+    if query is None:
+        return []
+    if not fts_available():
+        posts = BlogPost.objects.filter(
+            Q(title__icontains=text) | Q(excerpt__icontains=text), published=True,
+        ).values_list('pk', 'title', 'excerpt')[:limit]
+        return [(pk, escape(title), escape(excerpt)) for pk, title, excerpt in posts]
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT f.rowid,
+                   highlight({FTS_TABLE}, 0, %s, %s),
+                   snippet({FTS_TABLE}, 2, %s, %s, '…', 24)
+            FROM {FTS_TABLE} f
+            JOIN blog_blogpost p ON p.id = f.rowid
+            WHERE {FTS_TABLE} MATCH %s AND p.published
+            ORDER BY bm25({FTS_TABLE}, %s, %s, %s)
+            LIMIT %s
+            """,
+            [_MARK_OPEN, _MARK_CLOSE, _MARK_OPEN, _MARK_CLOSE, query, *BM25_WEIGHTS, limit],
+        )
+        rows = cursor.fetchall()
+    return [(pk, _marked(title), _marked(snippet)) for pk, title, snippet in rows]
+
+
+def filter_by_search(queryset, text):
+    """Restrict a ``BlogPost`` queryset to posts matching ``text``.
+
+    Returns ``None`` when there is no FTS index to use.
+    """
+    if not fts_available():
+        return None
+    query = match_query(text)
+    if query is None:
+        return queryset
+    return queryset.filter(
+        pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [query])
+    )
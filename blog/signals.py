@@ -0,0 +1,182 @@
+"""
+Keep denormalised blog data in step with posts.
+
+``published_post_count`` on categories and tags changes when a published
+post gains or loses a category/tag, when a post is published or
+unpublished, and when a published post is deleted.
+
+The related-posts index (``RelatedPost``) is refreshed around any post
+whose content, publication or taxonomy changed, once per transaction.
+
+The full-text index (``blog.search``) is updated on every save and delete.
+
+Bulk ``QuerySet.update()`` calls bypass these handlers; run
+``manage.py recount_blog_taxonomy`` and ``manage.py rebuild_related_posts --all``
+after those.
+"""
+import threading
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import BlogCategory, BlogPost, BlogTag, RelatedPost, refresh_related_posts
+from .search import index_post, unindex_post
+
+
+TAXONOMY = (('categories', BlogCategory), ('tags', BlogTag))
+
+
+def _adjust(model, pks, delta):
+    if pks and delta:
+        model.objects.filter(pk__in=pks).update(
+            published_post_count=F('published_post_count') + delta
+        )
+
+
+def _taxonomy_pks(post):
+    return {
+        model: list(getattr(post, field).values_list('pk', flat=True))
+        for field, model in TAXONOMY
+    }
+
+
+@receiver(pre_save, sender=BlogPost)
+def remember_published_state(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        instance._was_published = False
+    else:
+        instance._was_published = (
+            BlogPost.objects.filter(pk=instance.pk).values_list('published', flat=True).first()
+            or False
+        )
+
+
+@receiver(post_save, sender=BlogPost)
+def count_publish_transitions(sender, instance, created, raw=False, **kwargs):
+    was_published = getattr(instance, '_was_published', False)
+    if raw or created or was_published == instance.published:
+        # New posts have no taxonomy yet; m2m_changed counts it when added.
+        return
+    delta = 1 if instance.published else -1
+    for model, pks in _taxonomy_pks(instance).items():
+        _adjust(model, pks, delta)
+
+
+@receiver(pre_delete, sender=BlogPost)
+def remember_deleted_taxonomy(sender, instance, **kwargs):
+    instance._deleted_taxonomy = _taxonomy_pks(instance) if instance.published else {}
+
+
+@receiver(post_delete, sender=BlogPost)
+def count_deleted_post(sender, instance, **kwargs):
+    for model, pks in getattr(instance, '_deleted_taxonomy', {}).items():
+        _adjust(model, pks, -1)
+
+
+def _count_taxonomy_change(taxonomy, sender, instance, action, reverse, pk_set, **kwargs):
+    taxonomy_column = f'{taxonomy._meta.model_name}_id'
+    if reverse:
+        # category.posts.add(post, ...): instance is the category/tag.
+        own_column, other_column = taxonomy_column, 'blogpost_id'
+    else:
+        own_column, other_column = 'blogpost_id', taxonomy_column
+
+    if action in ('pre_remove', 'pre_clear'):
+        # remove() signals every pk it was given, member or not; remember
+        # the links that really exist so post_* only counts those.
+        existing = sender.objects.filter(**{own_column: instance.pk})
+        if action == 'pre_remove':
+            existing = existing.filter(**{f'{other_column}__in': pk_set})
+        instance._removed_taxonomy_pks = set(existing.values_list(other_column, flat=True))
+        return
+    if action == 'post_add':
+        pks, delta = pk_set, 1
+    elif action in ('post_remove', 'post_clear'):
+        pks, delta = instance.__dict__.pop('_removed_taxonomy_pks', set()), -1
+    else:
+        return
+
+    if reverse:
+        published = BlogPost.objects.filter(pk__in=pks, published=True).count() if pks else 0
+        _adjust(taxonomy, [instance.pk], delta * published)
+    elif instance.published:
+        _adjust(taxonomy, pks, delta)
+
+
+@receiver(m2m_changed, sender=BlogPost.categories.through)
+def count_category_changes(**kwargs):
+    _count_taxonomy_change(BlogCategory, **kwargs)
+
+
+@receiver(m2m_changed, sender=BlogPost.tags.through)
+def count_tag_changes(**kwargs):
+    _count_taxonomy_change(BlogTag, **kwargs)
+
+
+# Posts whose related-posts lists need refreshing when the transaction
+# commits. An admin save fires post_save plus several m2m_changed signals;
+# collecting them means the index is recomputed once.
+_pending_related = threading.local()
+
+
+def _flush_related_refresh():
+    pks = getattr(_pending_related, 'pks', None)
+    _pending_related.pks = set()
+    if pks:
+        refresh_related_posts(pks)
+
+
+def schedule_related_refresh(pks):
+    if not pks:
+        return
+    if not hasattr(_pending_related, 'pks'):
+        _pending_related.pks = set()
+    # Any earlier flush was either run or discarded with a rolled back
+    # transaction; leftover pks are simply refreshed with this batch.
+    _pending_related.pks.update(pks)
+    transaction.on_commit(_flush_related_refresh)
+
+
+@receiver(post_save, sender=BlogPost)
+def refresh_related_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_related_refresh([instance.pk])
+
+
+@receiver(pre_delete, sender=BlogPost)
+def refresh_related_on_delete(sender, instance, **kwargs):
+    # The index rows pointing at this post cascade away with it; refresh
+    # the lists that contained it.
+    schedule_related_refresh(
+        set(RelatedPost.objects.filter(related=instance).values_list('post_id', flat=True))
+    )
+
+
+@receiver(m2m_changed, sender=BlogPost.categories.through)
+@receiver(m2m_changed, sender=BlogPost.tags.through)
+def refresh_related_on_taxonomy_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            schedule_related_refresh([instance.pk])
+    elif action == 'pre_clear':
+        column = f'{instance._meta.model_name}_id'
+        instance._related_refresh_pks = set(
+            sender.objects.filter(**{column: instance.pk}).values_list('blogpost_id', flat=True)
+        )
+    elif action == 'post_clear':
+        schedule_related_refresh(instance.__dict__.pop('_related_refresh_pks', set()))
+    elif action in ('post_add', 'post_remove'):
+        schedule_related_refresh(pk_set)
+
+
+@receiver(post_save, sender=BlogPost)
+def update_search_index(sender, instance, **kwargs):
+    index_post(instance)
+
+
+@receiver(post_delete, sender=BlogPost)
+def remove_from_search_index(sender, instance, **kwargs):
+    unindex_post(instance.pk)
+
@@ -5,5 +5,6 @@ app_name = 'blog'
 
 urlpatterns = [
     path('', views.blog_list, name='blog_list'),
+    path('search/', views.blog_search, name='blog_search'),
     path('<slug:slug>/', views.blog_detail, name='blog_detail'),
 ]
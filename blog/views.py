@@ -1,98 +1,30 @@
-import re
+from urllib.parse import urlencode
 
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404
 from django.core.paginator import Paginator
-from django.db.models import Count, Q
-from markdownx.utils import markdownify
-from .models import BlogPost, BlogCategory, BlogTag
+from django.db.models import Prefetch
+from django.utils.functional import SimpleLazyObject
+from home.page_cache import cache_anonymous_page
+from home.singletons import get_cached_solo
+from .facets import FacetSelection, get_facet_index
+from .models import BlogPost, BlogCategory, BlogTag, RelatedPost
+from .search import search_posts
 from resume.models import Resume
 
 
-def _markdownify_with_math(content):
-    """Convert Markdown to HTML while preserving LaTeX math blocks.
-
-    The standard Markdown processor treats backslashes as escape characters
-    and underscores as emphasis markers, which corrupts LaTeX.  This helper
-    extracts ``$$…$$`` and ``$…$`` spans before processing, replaces them
-    with unique placeholders, runs *markdownify*, then restores the originals.
-
-    Dollar-sign delimiters are converted to ``\\[…\\]`` (display) and
-    ``\\(…\\)`` (inline) so that literal ``$`` in the final HTML is never
-    ambiguous with currency symbols like $100 or $HACHI.
-    """
-    placeholders = {}
-    counter = [0]
-
-    def _placeholder(match, display=False):
-        """Replace a math span with a unique key and store the converted form."""
-        raw = match.group(0)
-        inner = match.group(1)
-        counter[0] += 1
-        key = f"MATHBLOCK{counter[0]}"
-        if display:
-            placeholders[key] = f"\\[{inner}\\]"
-        else:
-            placeholders[key] = f"\\({inner}\\)"
-        return key
-
-    # 1. Display math  $$…$$  (may span multiple lines)
-    protected = re.sub(
-        r'\$\$(.+?)\$\$',
-        lambda m: _placeholder(m, display=True),
-        content,
-        flags=re.DOTALL,
-    )
-
-    # 2. Inline math  $…$  – must contain a backslash OR be short & start
-    #    with a letter so we never match currency like $100 or $HACHI.
-    def _inline_placeholder(match):
-        return _placeholder(match, display=False)
-
-    #    Pattern A: contains a backslash  (e.g. $\frac{a}{b}$)
-    protected = re.sub(r'\$(?!\$)([^$\n]*?\\[^$\n]*?)\$', _inline_placeholder, protected)
-    #    Pattern B: short (1-10 chars), starts with a letter  (e.g. $k$, $x_i$)
-    protected = re.sub(r'\$(?!\$)([a-zA-Z][^$\n]{0,8}?)\$', _inline_placeholder, protected)
-
-    # 3. Also protect existing \[…\] and \(…\) from Markdown mangling
-    protected = re.sub(
-        r'\\\[(.+?)\\\]',
-        lambda m: _placeholder(m, display=True),
-        protected,
-        flags=re.DOTALL,
-    )
-    protected = re.sub(
-        r'\\\((.+?)\\\)',
-        lambda m: _placeholder(m, display=False),
-        protected,
-    )
-
-    html = markdownify(protected)
+BLOG_POSTS_PER_PAGE = 4
 
-    for key in sorted(placeholders, key=len, reverse=True):
-        html = html.replace(key, placeholders[key])
+BLOG_SEARCH_RESULTS = 20
 
-    return html
+# Columns the post cards in blog_list and the related-posts sidebar render;
+# the Markdown source and rendered HTML can be tens of KB per post.
+BLOG_CARD_FIELDS = ('id', 'title', 'slug', 'excerpt', 'featured_image', 'author', 'created_date')
 
 
-def blog_list(request):
-    """Display list of published blog posts with pagination."""
-    posts = BlogPost.objects.filter(published=True)
-    
-    # Filter by categories and/or tags if provided (OR logic - matches any)
-    category_slugs = request.GET.getlist('category')
-    tag_slugs = request.GET.getlist('tag')
-    
-    if category_slugs or tag_slugs:
-        filter_q = Q()
-        if category_slugs:
-            filter_q |= Q(categories__slug__in=category_slugs)
-        if tag_slugs:
-            filter_q |= Q(tags__slug__in=tag_slugs)
-        posts = posts.filter(filter_q).distinct()
-    
-    # Pagination
-    paginator = Paginator(posts, 4)  # 4 posts per page
-    page_number = request.GET.get('page')
+def _numbered_page(posts, page_number):
+    """Return ``(page_obj, page_range)`` for classic numbered pagination."""
+    paginator = Paginator(posts, BLOG_POSTS_PER_PAGE)
     page_obj = paginator.get_page(page_number)
     
     # Compute consistent page range (always show 5 pages if available)
@@ -114,23 +46,69 @@ def blog_list(request):
         
         page_range = range(start, end + 1)
     
-    # Get all categories and tags for sidebar with post counts, sorted by count
-    categories = BlogCategory.objects.annotate(
-        post_count=Count('posts', filter=Q(posts__published=True))
-    ).order_by('-post_count', 'name')
-    tags = BlogTag.objects.annotate(
-        post_count=Count('posts', filter=Q(posts__published=True))
-    ).order_by('-post_count', 'name')
+    return page_obj, page_range
+
+
+def _taxonomy_by_post_count(model, slugs=None):
+    objects = model.objects.order_by('-published_post_count', 'name')
+    if slugs is not None:
+        objects = objects.filter(slug__in=slugs)
+    return list(objects)
+
+
+def _taxonomy_sidebar(index, category_slugs, tag_slugs):
+    """Return ``(categories, tags)`` sorted by post count, with ``facet_count`` set."""
+    category_counts, tag_counts = index.toggle_counts(category_slugs, tag_slugs)
+    categories = _taxonomy_by_post_count(BlogCategory)
+    tags = _taxonomy_by_post_count(BlogTag)
+    for category in categories:
+        category.facet_count = category_counts.get(category.slug, 0)
+    for tag in tags:
+        tag.facet_count = tag_counts.get(tag.slug, 0)
+    return categories, tags
+
+
+@cache_anonymous_page(query_params=('category', 'tag', 'page', 'cursor'))
+def blog_list(request):
+    """Display list of published blog posts with pagination."""
+    # Columns for the post cards; the facet index decides which posts
+    posts = BlogPost.objects.filter(published=True).only(*BLOG_CARD_FIELDS).prefetch_related(
+        Prefetch('categories', queryset=BlogCategory.objects.only('id', 'name'))
+    )
+    
+    # Filter by categories and/or tags if provided (OR logic - matches any)
+    category_slugs = request.GET.getlist('category')
+    tag_slugs = request.GET.getlist('tag')
+    
+    # Filtering, ordering and counting come from the in-memory facet index,
+    # so only the posts on the page are loaded from the database
+    index = get_facet_index()
+    selection = FacetSelection(index, index.select(category_slugs, tag_slugs), posts)
+    
+    cursor_pagination = settings.BLOG_PAGINATION == 'cursor'
+    if cursor_pagination:
+        page_obj = selection.cursor_page(request.GET.get('cursor'), BLOG_POSTS_PER_PAGE)
+        page_obj.total_count = selection.count()
+        page_range = []
+    else:
+        page_obj, page_range = _numbered_page(selection, request.GET.get('page'))
     
     # Get actual selected category/tag objects for display
-    selected_category_objects = BlogCategory.objects.filter(slug__in=category_slugs) if category_slugs else []
-    selected_tag_objects = BlogTag.objects.filter(slug__in=tag_slugs) if tag_slugs else []
+    selected_category_objects = _taxonomy_by_post_count(BlogCategory, category_slugs) if category_slugs else []
+    selected_tag_objects = _taxonomy_by_post_count(BlogTag, tag_slugs) if tag_slugs else []
+    
+    # All categories and tags for the sidebar, each with how many posts
+    # would be listed with it toggled; only built if the cached sidebar
+    # fragment has to render
+    sidebar = SimpleLazyObject(lambda: _taxonomy_sidebar(index, category_slugs, tag_slugs))
     
     context = {
         'page_obj': page_obj,
         'page_range': page_range,
-        'categories': categories,
-        'tags': tags,
+        'cursor_pagination': cursor_pagination,
+        'filter_query': urlencode([('category', c) for c in category_slugs] + [('tag', t) for t in tag_slugs]),
+        'categories': SimpleLazyObject(lambda: sidebar[0]),
+        'tags': SimpleLazyObject(lambda: sidebar[1]),
         'selected_categories': category_slugs,
         'selected_tags': tag_slugs,
         'selected_category_objects': selected_category_objects,
@@ -143,20 +121,50 @@ def blog_list(request):
     return render(request, template, context)
 
 
+def blog_search(request):
+    """Full-text search over published posts, ranked by BM25."""
+    query = request.GET.get('q', '').strip()
+    results = []
+    if query:
+        hits = search_posts(query, limit=BLOG_SEARCH_RESULTS)
+        posts = BlogPost.objects.only(*BLOG_CARD_FIELDS).in_bulk([pk for pk, _, _ in hits])
+        results = [
+            {'post': posts[pk], 'title_html': title_html, 'snippet_html': snippet_html}
+            for pk, title_html, snippet_html in hits if pk in posts
+        ]
+    
+    context = {
+        'query': query,
+        'results': results,
+        'active_page': 'blog',
+    }
+    
+    # Live search from the sidebar box only swaps the results list
+    if request.htmx and request.htmx.target == 'blog-search-results':
+        template = 'blog/search_results.html'
+    else:
+        template = 'blog/blog_search_partial.html' if request.htmx else 'blog/blog_search.html'
+    return render(request, template, context)
+
+
+@cache_anonymous_page()
 def blog_detail(request, slug):
     """Display a single blog post."""
-    post = get_object_or_404(BlogPost, slug=slug, published=True)
-    resume = Resume.get_solo()
+    post = get_object_or_404(
+        BlogPost.objects.prefetch_related('categories', 'tags'), slug=slug, published=True
+    )
+    resume = get_cached_solo(Resume)
     
-    # Get related posts (same category)
-    related_posts = BlogPost.objects.filter(
-        published=True,
-        categories__in=post.categories.all()
-    ).exclude(id=post.id).distinct()[:3]
+    # Get related posts from the precomputed index (see blog.related)
+    related_posts = [
+        entry.related for entry in RelatedPost.objects.filter(post=post, related__published=True)
+        .select_related('related')
+        .only('related', 'related__title', 'related__slug', 'related__excerpt')[:3]
+    ]
     
     context = {
         'post': post,
-        'post_content_html': _markdownify_with_math(post.content),
+        'post_content_html': post.get_content_html(),
         'related_posts': related_posts,
         'resume': resume,
         'active_page': 'blog',
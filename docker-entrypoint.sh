@@ -27,6 +27,10 @@ else
     exit 1
 fi
 
+# Fill the related-posts index if it is empty and refresh posts whose
+# content terms are stale (new posts are indexed as they are saved)
+python manage.py rebuild_related_posts
+
 echo "🚀 Starting application..."
 
 # Execute the main command (usually gunicorn)
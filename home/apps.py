@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save
 
 
 class HomeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'home'
+
+    def ready(self):
+        from .dependencies import install_write_tracker
+        connection_created.connect(install_write_tracker)
+
+        from .renditions import IMAGE_FIELDS, schedule_renditions_on_save
+        for label in IMAGE_FIELDS:
+            post_save.connect(schedule_renditions_on_save, sender=label)
@@ -3,13 +3,17 @@ Context processors for the home app.
 Makes site configuration available to all templates.
 """
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
 from .models import SiteConfiguration
+from .singletons import get_cached_solo
 
 
 def site_config(request):
     """
     Add site configuration to the context of all templates.
     This makes site_config available globally without needing to pass it in every view.
+    It is loaded lazily from the process-local singleton cache, so pages whose
+    templates (or cached fragments) never touch it cost nothing.
     
     Args:
         request: HttpRequest object (required by Django context processor interface)
@@ -17,13 +21,14 @@ def site_config(request):
     Returns:
         dict: Context dictionary with site_config and canonical_url
     """
-    # Build canonical URL - use SITE_URL if set, otherwise use request
+    # Build canonical URL - use SITE_URL if set, otherwise use request. The
+    # query string is left out: cached pages are shared across query strings.
     if settings.SITE_URL:
         canonical_url = settings.SITE_URL.rstrip('/') + request.path
     else:
-        canonical_url = request.build_absolute_uri()
+        canonical_url = request.build_absolute_uri(request.path)
     
     return {
-        'site_config': SiteConfiguration.get_solo(),
+        'site_config': SimpleLazyObject(lambda: get_cached_solo(SiteConfiguration)),
         'canonical_url': canonical_url,
     }
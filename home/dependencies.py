@@ -0,0 +1,239 @@
+"""
+Track which database tables and rows rendered output depends on.
+
+Writes: every connection carries :func:`track_writes` as an execute
+wrapper (installed from ``HomeConfig.ready``). Once the transaction
+commits, each INSERT, UPDATE or DELETE bumps content version stamps
+(``home.versions``):
+
+* ``table:<table>`` for any write to the table;
+* ``row:<table>:<pk>`` for an UPDATE or DELETE addressed by primary key,
+  which is how ``Model.save()`` and ``Model.delete()`` write;
+* ``rows:<table>`` for any other write, which may have touched any row.
+
+Because this works on the SQL, ``QuerySet.update()``, bulk operations and
+raw SQL invalidate as reliably as ``save()`` does.
+
+Reads: a :class:`DependencyRecorder` notes the tables each SELECT reads
+while it is active. Plain primary key lookups (``get(pk=...)``,
+``get_or_create(pk=...)``, ``in_bulk()``), also when they join the
+multi-table inheritance parents or children of the model, narrow the
+dependency to those rows, so editing one project leaves other projects'
+pages alone. Code that
+serves data from memory instead of querying (``blog.facets``) declares its
+tables with :func:`record_tables`; output reused from a cache re-declares
+its stamps with :func:`record_stamps`, so an enclosing page inherits
+them.
+"""
+import re
+import threading
+import time
+from functools import lru_cache, partial
+
+from django.apps import apps
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .versions import bump_version, get_versions, missing_versions_start_at
+
+
+# Bookkeeping tables that never feed a page.
+IGNORED_TABLES = frozenset({'django_session', 'django_admin_log', 'django_migrations'})
+
+# A write addressed to more rows than this bumps rows:<table> instead of
+# one stamp per row.
+MAX_ROW_STAMPS = 100
+
+_READ_TABLE_RE = re.compile(r'\b(?:FROM|JOIN)\s+"?(\w+)"?', re.IGNORECASE)
+_WRITE_RE = re.compile(r'^\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM)\s+"?(\w+)"?', re.IGNORECASE)
+_PK_WHERE = r'WHERE "(\w+)"\."(\w+)" (?:= %s|IN \((?:%s, )*%s\))'
+# Joins on "a"."col" = "b"."col", the way multi-table inheritance joins
+# parent and child tables.
+_JOIN = r' (?:INNER|LEFT OUTER) JOIN "\w+" ON \("\w+"\."\w+" = "\w+"\."\w+"\)'
+_JOIN_RE = re.compile(r' (?:INNER|LEFT OUTER) JOIN "(\w+)" ON \("(\w+)"\."(\w+)" = "(\w+)"\."(\w+)"\)')
+_PK_READ_RE = re.compile(rf'^SELECT .+? FROM "(\w+)"((?:{_JOIN})*) {_PK_WHERE}(?: LIMIT \d+)?$', re.DOTALL)
+_PK_WRITE_RE = re.compile(rf' {_PK_WHERE}$')
+
+_local = threading.local()
+
+
+@lru_cache(maxsize=None)
+def _pk_columns():
+    return {
+        model._meta.db_table: model._meta.pk.column
+        for model in apps.get_models(include_auto_created=True)
+    }
+
+
+def _pk_joined_tables(table, joins):
+    """``table`` plus the tables in ``joins``, if each is joined primary key to primary key.
+
+    Those rows share the looked-up primary key, as a multi-table
+    inheritance parent and its children do. Returns ``None`` for any other
+    join, since it may read rows the lookup does not name.
+    """
+    pk_columns = _pk_columns()
+    tables = [table]
+    for joined, *sides in _JOIN_RE.findall(joins):
+        (left, left_column), (right, right_column) = sides[:2], sides[2:]
+        pairs = {(left, left_column), (right, right_column)}
+        if (joined, pk_columns.get(joined)) not in pairs:
+            return None
+        other = pairs - {(joined, pk_columns.get(joined))}
+        if not any(other_table in tables and pk_columns.get(other_table) == column for other_table, column in other):
+            return None
+        tables.append(joined)
+    return tables
+
+
+def _tracked(table):
+    return table not in IGNORED_TABLES and not table.startswith('sqlite_')
+
+
+def table_stamp(table):
+    return f'table:{table}'
+
+
+def row_stamps(table, pk):
+    """The stamps a read of one row depends on."""
+    return f'row:{table}:{pk}', f'rows:{table}'
+
+
+def written_stamps(sql, params, many=False):
+    """Return the stamp names a write statement moves (empty for reads)."""
+    match = _WRITE_RE.match(sql)
+    if not match or not _tracked(match.group(1)):
+        return set()
+    table = match.group(1)
+    stamps = {table_stamp(table)}
+
+    where = _PK_WRITE_RE.search(sql)
+    pks = []
+    if where and where.group(1) == table and _pk_columns().get(table) == where.group(2):
+        count = where.group(0).count('%s')
+        for row_params in (params if many else [params]):
+            pks.extend(row_params[-count:])
+    if not pks or len(pks) > MAX_ROW_STAMPS:
+        stamps.add(f'rows:{table}')
+    else:
+        stamps.update(f'row:{table}:{pk}' for pk in pks)
+    return stamps
+
+
+def track_writes(execute, sql, params, many, context):
+    """Execute wrapper bumping the stamps of whatever the statement wrote."""
+    result = execute(sql, params, many, context)
+    stamps = written_stamps(sql, params, many)
+    if stamps:
+        transaction.on_commit(partial(bump_version, *stamps), using=context['connection'].alias)
+    return result
+
+
+def install_write_tracker(sender, connection, **kwargs):
+    """``connection_created`` receiver adding :func:`track_writes` to the connection."""
+    if track_writes not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, track_writes)
+
+
+def _active_recorders():
+    if not hasattr(_local, 'recorders'):
+        _local.recorders = []
+    return _local.recorders
+
+
+def record_tables(*tables):
+    """Declare that the output being recorded depends on ``tables``."""
+    for recorder in _active_recorders():
+        recorder.tables.update(table for table in tables if _tracked(table))
+
+
+def record_stamps(*names):
+    """Declare dependencies by stamp name, e.g. those of output reused from a cache."""
+    for recorder in _active_recorders():
+        recorder.extra_stamps.update(names)
+
+
+def model_tables(label):
+    """Tables behind ``'app_label'`` or ``'app_label.Model'``, many-to-many tables included."""
+    if '.' in label:
+        models = [apps.get_model(label)]
+    else:
+        models = list(apps.get_app_config(label).get_models())
+    tables = set()
+    for model in models:
+        tables.add(model._meta.db_table)
+        tables.update(
+            field.remote_field.through._meta.db_table for field in model._meta.local_many_to_many
+        )
+    return tables
+
+
+def render_tracked(render, tables=()):
+    """Call ``render()`` under a :class:`DependencyRecorder`.
+
+    Returns ``(result, stamps)``: ``stamps`` maps every stamp the result
+    depends on (``tables`` included) to its value, or is ``None`` if one
+    of them moved while rendering, so the result may already be stale and
+    must not be cached.
+    """
+    started = time.time_ns()
+    # Missing stamps start just before the render, also when nested code
+    # reads them first; anything newer was bumped mid-render.
+    with DependencyRecorder() as recorder, missing_versions_start_at(started - 1):
+        record_tables(*tables)
+        result = render()
+        stamps = get_versions(*recorder.stamps())
+    if any(stamp >= started for stamp in stamps.values()):
+        return result, None
+    return result, stamps
+
+
+class DependencyRecorder:
+    """Collect the tables and rows read while the ``with`` block runs.
+
+    Recorders nest: queries and :func:`record_tables` calls count towards
+    every active recorder on the thread.
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.connection = connections[using]
+        self.tables = set()
+        self.rows = set()
+        self.extra_stamps = set()
+
+    def __enter__(self):
+        self._wrapper = self.connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        _active_recorders().append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _active_recorders().remove(self)
+        return self._wrapper.__exit__(*exc_info)
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many:
+            self.observe(sql, params or ())
+        return execute(sql, params, many, context)
+
+    def observe(self, sql, params):
+        if not sql.lstrip().upper().startswith('SELECT'):
+            return
+        lookup = _PK_READ_RE.match(sql)
+        if (
+            lookup and lookup.group(1) == lookup.group(3)
+            and _pk_columns().get(lookup.group(1)) == lookup.group(4)
+            and sql.count('%s') == len(params)
+        ):
+            tables = _pk_joined_tables(lookup.group(1), lookup.group(2))
+            if tables is not None:
+                self.rows.update((table, pk) for table in tables for pk in params)
+                return
+        self.tables.update(table for table in _READ_TABLE_RE.findall(sql) if _tracked(table))
+
+    def stamps(self):
+        """The stamp names covering everything read so far."""
+        stamps = {table_stamp(table) for table in self.tables} | self.extra_stamps
+        for table, pk in self.rows:
+            if table not in self.tables and _tracked(table):
+                stamps.update(row_stamps(table, pk))
+        return stamps
@@ -0,0 +1,77 @@
+"""
+Cross-process locks for regenerating cached content.
+
+Gunicorn workers share the cache but not memory, so "only one of us
+renders this" needs a lock every process can see. ``flock()`` on a file
+under ``PAGE_CACHE_LOCK_DIR`` is one: it works between processes and,
+since each acquisition opens the file separately, between threads too,
+and the kernel drops it if the holder dies.
+
+Each key has its own lock file, named after a hash of the key, so
+renders of unrelated pages never wait for each other. The holder deletes
+the file before unlocking it, which keeps the directory down to the
+renders in progress; a waiter that then gets the lock on the deleted
+file notices and retries on the current one.
+
+Without ``fcntl`` (Windows) every acquisition succeeds immediately:
+renders are simply not coordinated.
+"""
+import hashlib
+import os
+import time
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+POLL_INTERVAL = 0.02
+
+
+class RenderLock:
+    """An exclusive, non-reentrant lock on ``key``."""
+
+    def __init__(self, key):
+        digest = hashlib.sha256(key.encode()).hexdigest()[:32]
+        self.path = os.path.join(settings.PAGE_CACHE_LOCK_DIR, f'render-{digest}.lock')
+        self._file = None
+
+    def _is_current(self, lock_file):
+        """Whether ``lock_file`` is still the file at ``self.path`` (not deleted by a releaser)."""
+        try:
+            return os.path.samestat(os.fstat(lock_file.fileno()), os.stat(self.path))
+        except FileNotFoundError:
+            return False
+
+    def acquire(self, timeout=0):
+        """Take the lock, waiting up to ``timeout`` seconds; return whether it was taken."""
+        if fcntl is None:
+            return True
+        os.makedirs(settings.PAGE_CACHE_LOCK_DIR, exist_ok=True)
+        deadline = time.monotonic() + timeout
+        lock_file = open(self.path, 'ab')
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    lock_file.close()
+                    return False
+                time.sleep(POLL_INTERVAL)
+                continue
+            if self._is_current(lock_file):
+                self._file = lock_file
+                return True
+            # Locked a file its previous holder deleted on release
+            lock_file.close()
+            lock_file = open(self.path, 'ab')
+
+    def release(self):
+        if self._file is not None:
+            os.unlink(self.path)
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
@@ -0,0 +1,30 @@
+"""
+Create the responsive renditions of every uploaded image that lacks them.
+
+New uploads get theirs in the background when saved; run this once for
+images uploaded before, or after changing IMAGE_RENDITION_WIDTHS.
+
+Usage:
+    python manage.py generate_renditions
+"""
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from home.renditions import IMAGE_FIELDS, generate_renditions
+
+
+class Command(BaseCommand):
+    help = 'Generate missing AVIF/WebP/JPEG renditions of uploaded images.'
+
+    def handle(self, *args, **options):
+        images = skipped = 0
+        for label, field in IMAGE_FIELDS.items():
+            names = apps.get_model(label).objects.values_list(field, flat=True).distinct()
+            for name in filter(None, names):
+                images += 1
+                if not generate_renditions(name)['formats']:
+                    skipped += 1
+                    self.stderr.write(f'{name}: missing, animated or unreadable; served as uploaded')
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked renditions of {images} image(s); {skipped} served as uploaded.'
+        ))
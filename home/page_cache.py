@@ -0,0 +1,199 @@
+"""
+Full-page response cache for anonymous visitors.
+
+Every page can come back either as a whole document or as the HTMX
+partial swapped into ``#main-content``, so the cache key includes
+whether the request came from HTMX (and responses carry
+``Vary: HX-Request`` so browsers and proxies keep the two apart).
+
+Views need no list of the models they use: the render runs under a
+``home.dependencies`` recorder, and the entry stores the
+stamps of every table and row it read. An entry is served only while
+all of those stamps are unchanged, so a write invalidates exactly the
+pages that read what was written. Stale entries are never deleted, just
+replaced or left to age out.
+
+Cached responses carry an ETag and Last-Modified computed from those
+stamps, so a browser revalidating a page (including HTMX requests and
+history restores) gets a bodiless 304 without anything being rendered.
+
+Regeneration is single-flight across threads and worker processes
+(``home.locks``): when a popular page is invalidated, one request
+re-renders it while the others get the previous copy for a short grace
+period, or wait for the new one.
+"""
+import hashlib
+import logging
+import threading
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.http import QueryDict
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from .dependencies import render_tracked
+from .locks import RenderLock
+from .versions import get_versions
+
+
+logger = logging.getLogger(__name__)
+
+
+def normalized_query(request, params):
+    """The whitelisted query parameters, values deduplicated and sorted.
+
+    ``?tag=b&tag=a&tag=b&utm_source=x`` and ``?tag=a&tag=b`` render the
+    same page and share one entry.
+    """
+    pairs = []
+    for name in sorted(params):
+        values = sorted({value for value in request.GET.getlist(name) if value})
+        pairs.extend((name, value) for value in values)
+    return urlencode(pairs)
+
+
+def page_cache_key(request, query_params=()):
+    parts = [
+        request.scheme,
+        request.get_host(),
+        request.path,
+        normalized_query(request, query_params),
+        'partial' if request.htmx else 'full',
+    ]
+    digest = hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+    return f'page:{digest}'
+
+
+def _cacheable_request(request):
+    return (
+        settings.PAGE_CACHE_TIMEOUT > 0
+        and request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+    )
+
+
+def _cacheable_response(response):
+    return response.status_code == 200 and not response.streaming and not response.cookies
+
+
+def get_cached_page(key):
+    """Return ``(response, stale_for)`` for ``key``, or ``(None, None)`` on a miss.
+
+    ``stale_for`` is ``None`` for a fresh entry, otherwise how many seconds
+    ago the first of its dependencies moved. Stamps are bump times, so the
+    entry's age past invalidation comes straight from them.
+    """
+    entry = cache.get(key)
+    if entry is None:
+        return None, None
+    stamps, response = entry
+    current = get_versions(*stamps)
+    moved = [current[name] for name in stamps if current[name] != stamps[name]]
+    if not moved:
+        return response, None
+    return response, max(0, time.time_ns() - min(moved)) / 1e9
+
+
+def set_validators(response, key, stamps):
+    """Give ``response`` an ETag and Last-Modified derived from its dependency stamps.
+
+    The stamps change whenever anything the page read is written, and the
+    newest of them is the time of the latest such write. ``no-cache`` makes
+    browsers revalidate every time rather than guess a freshness lifetime
+    from Last-Modified.
+    """
+    state = '\n'.join([key, *(f'{name}={stamps[name]}' for name in sorted(stamps))])
+    response['ETag'] = quote_etag(hashlib.sha256(state.encode()).hexdigest()[:32])
+    response['Last-Modified'] = http_date(max(stamps.values(), default=0) // 10**9)
+    patch_cache_control(response, no_cache=True)
+
+
+def render_and_cache(key, render):
+    """Call ``render()`` while recording its reads, and cache the response if possible."""
+    response, stamps = render_tracked(render)
+    if stamps is not None and _cacheable_response(response):
+        set_validators(response, key, stamps)
+        cache.set(key, (stamps, response), settings.PAGE_CACHE_TIMEOUT)
+    return response
+
+
+def conditional_response(request, response):
+    """Answer a conditional request with 304 Not Modified when its validators still match."""
+    etag = response.get('ETag')
+    last_modified = parse_http_date_safe(response.get('Last-Modified', ''))
+    if etag or last_modified:
+        return get_conditional_response(request, etag=etag, last_modified=last_modified, response=response)
+    return response
+
+
+def _refresh_in_background(key, render, lock):
+    try:
+        render_and_cache(key, render)
+    except Exception:
+        logger.exception('Background refresh of cached page %s failed', key)
+    finally:
+        lock.release()
+        connections.close_all()
+
+
+def get_or_render(key, render):
+    """Serve ``key`` from the cache, rendering it at most once at a time.
+
+    A fresh entry is returned as is. An entry invalidated less than
+    ``PAGE_CACHE_STALE_GRACE`` seconds ago is returned too while one
+    background thread, holding the key's render lock, re-renders it.
+    Otherwise the first request to take the lock renders and everyone else
+    waits for its result, rendering themselves only if that takes longer
+    than ``PAGE_CACHE_LOCK_TIMEOUT`` or the result could not be cached.
+    """
+    response, stale_for = get_cached_page(key)
+    if response is not None and stale_for is None:
+        return response
+    lock = RenderLock(key)
+    if response is not None and stale_for <= settings.PAGE_CACHE_STALE_GRACE:
+        if lock.acquire():
+            threading.Thread(
+                target=_refresh_in_background, args=(key, render, lock), daemon=True,
+            ).start()
+        return response
+
+    if not lock.acquire(timeout=settings.PAGE_CACHE_LOCK_TIMEOUT):
+        return render()
+    try:
+        response, stale_for = get_cached_page(key)
+        if response is not None and stale_for is None:
+            return response
+        return render_and_cache(key, render)
+    finally:
+        lock.release()
+
+
+def cache_anonymous_page(query_params=()):
+    """Cache a view's anonymous GET responses until anything they read changes.
+
+    Only ``query_params`` take part in the key, and the view gets
+    ``request.GET`` rebuilt from exactly what went into it (see
+    :func:`normalized_query`), so two requests sharing an entry can't
+    render differently. Nothing else about the request may change the
+    response.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            request.GET = QueryDict(normalized_query(request, query_params))
+            if not _cacheable_request(request):
+                response = view_func(request, *args, **kwargs)
+            else:
+                key = page_cache_key(request, query_params)
+                response = conditional_response(
+                    request, get_or_render(key, lambda: view_func(request, *args, **kwargs)),
+                )
+            patch_vary_headers(response, ('HX-Request',))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,185 @@
+"""
+Resized copies ("renditions") of uploaded images for responsive ``srcset``s.
+
+Every image in ``IMAGE_FIELDS`` gets AVIF, WebP and JPEG variants (PNG
+instead of JPEG if it has transparency) at each of the
+``IMAGE_RENDITION_WIDTHS`` narrower than the original, plus one at the
+original width if that is smaller than the largest. They are stored under
+``MEDIA_ROOT/renditions/`` named after a hash of the source bytes, so a
+rendition never changes once written.
+
+Generation stays off the request path. Saving a model schedules it on a
+background thread once the transaction commits, and
+``manage.py generate_renditions`` backfills existing uploads. The
+``{% responsive_image %}`` tag serves the original until the renditions
+exist, or when one of the files has gone missing (checked at most every
+``IMAGE_RENDITION_CHECK_INTERVAL`` seconds), and schedules them
+meanwhile; pages rendered with the original depend on
+:func:`rendition_stamp`, which moves once the renditions are ready.
+"""
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .locks import RenderLock
+from .versions import bump_version
+
+
+logger = logging.getLogger(__name__)
+
+RENDITION_DIR = 'renditions'
+
+# Model label -> image field whose uploads get renditions
+IMAGE_FIELDS = {
+    'projects.ProjectImage': 'image',
+    'blog.BlogPost': 'featured_image',
+    'home.SiteConfiguration': 'profile_image',
+}
+
+# (Pillow format, MIME type, extension, encoder options), most compact
+# first; the <img> fallback, JPEG or PNG, comes last
+MODERN_FORMATS = (
+    ('AVIF', 'image/avif', 'avif', {'quality': 50}),
+    ('WEBP', 'image/webp', 'webp', {'quality': 75, 'method': 6}),
+)
+JPEG_FORMAT = ('JPEG', 'image/jpeg', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True})
+PNG_FORMAT = ('PNG', 'image/png', 'png', {'optimize': True})
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='renditions')
+_scheduled = set()
+_scheduled_lock = threading.Lock()
+
+
+def _name_digest(name):
+    return hashlib.sha256(name.encode()).hexdigest()[:32]
+
+
+def _manifest_key(name):
+    return f'rendition-manifest:{_name_digest(name)}'
+
+
+def _checked_key(name):
+    return f'rendition-checked:{_name_digest(name)}'
+
+
+def rendition_stamp(name):
+    """Version stamp moved whenever the renditions of ``name`` are (re)generated."""
+    return f'renditions:{_name_digest(name)}'
+
+
+def _target_widths(width):
+    widths = settings.IMAGE_RENDITION_WIDTHS
+    return sorted({w for w in widths if w < width} | {min(width, max(widths))})
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+
+
+def generate_renditions(name):
+    """Write whatever renditions of the stored image ``name`` are missing.
+
+    Returns the manifest, ``{'formats': [(mime_type, [(width, path), ...]), ...]}``
+    with the <img> fallback last. Images Pillow cannot read, and animated
+    ones, get an empty list of formats and are served as uploaded, as are
+    missing files.
+    """
+    formats = []
+    written = False
+    try:
+        with default_storage.open(name, 'rb') as source:
+            data = source.read()
+        image = Image.open(io.BytesIO(data))
+        animated = getattr(image, 'n_frames', 1) > 1
+    except (UnidentifiedImageError, OSError):
+        # Missing or not an image Pillow can read
+        image, animated = None, False
+    if image is not None and not animated:
+        digest = hashlib.sha256(data).hexdigest()[:20]
+        image = ImageOps.exif_transpose(image)
+        alpha = _has_alpha(image)
+        image = image.convert('RGBA' if alpha else 'RGB')
+        encodings = (*MODERN_FORMATS, PNG_FORMAT if alpha else JPEG_FORMAT)
+        variants = {mime_type: [] for _, mime_type, _, _ in encodings}
+        for width in _target_widths(image.width):
+            resized = None
+            for image_format, mime_type, extension, options in encodings:
+                path = f'{RENDITION_DIR}/{digest[:2]}/{digest}-{width}w.{extension}'
+                if not default_storage.exists(path):
+                    if resized is None:
+                        height = max(1, round(image.height * width / image.width))
+                        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+                    buffer = io.BytesIO()
+                    resized.save(buffer, image_format, **options)
+                    saved = default_storage.save(path, ContentFile(buffer.getvalue()))
+                    written = True
+                    if saved != path:
+                        # Another process wrote the same rendition first
+                        default_storage.delete(saved)
+                variants[mime_type].append((width, path))
+        formats = list(variants.items())
+
+    manifest = {'formats': formats}
+    if written or cache.get(_manifest_key(name)) != manifest:
+        cache.set(_manifest_key(name), manifest, None)
+        bump_version(rendition_stamp(name))
+    return manifest
+
+
+def _generate_in_background(name):
+    lock = RenderLock(_manifest_key(name))
+    try:
+        # If another process holds the lock it is generating these already
+        if lock.acquire():
+            try:
+                generate_renditions(name)
+            finally:
+                lock.release()
+    except Exception:
+        logger.exception('Generating renditions of %s failed', name)
+    finally:
+        with _scheduled_lock:
+            _scheduled.discard(name)
+
+
+def schedule_renditions(name):
+    """Generate the renditions of ``name`` on the background thread, unless already queued."""
+    with _scheduled_lock:
+        if name in _scheduled:
+            return
+        _scheduled.add(name)
+    _executor.submit(_generate_in_background, name)
+
+
+def get_renditions(name):
+    """Return the manifest of ``name`` if all its renditions exist, else schedule them and return ``None``.
+
+    Storage is only asked whether the files exist once per
+    ``IMAGE_RENDITION_CHECK_INTERVAL``, not on every render.
+    """
+    manifest = cache.get(_manifest_key(name))
+    if manifest is not None:
+        if cache.get(_checked_key(name)) == manifest:
+            return manifest
+        if all(default_storage.exists(path) for _, variants in manifest['formats'] for _, path in variants):
+            cache.set(_checked_key(name), manifest, settings.IMAGE_RENDITION_CHECK_INTERVAL)
+            return manifest
+    schedule_renditions(name)
+    return None
+
+
+def schedule_renditions_on_save(sender, instance, raw=False, **kwargs):
+    """``post_save`` receiver for the models in ``IMAGE_FIELDS``."""
+    name = getattr(instance, IMAGE_FIELDS[sender._meta.label]).name
+    if name and not raw:
+        transaction.on_commit(partial(schedule_renditions, name))
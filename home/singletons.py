@@ -0,0 +1,35 @@
+"""
+Process-local cache for singleton models (``SiteConfiguration``, ``Resume``).
+
+Every page shows the site configuration, so fetching it is worth avoiding:
+each worker keeps the instance in memory and reuses it until the model's
+table stamp (``home.dependencies``) moves, which happens on any write to
+the table, admin saves included. A hit costs one shared-cache read and no
+database query.
+"""
+import copy
+import threading
+
+from .dependencies import record_tables, table_stamp
+from .versions import get_version
+
+
+_instances = {}
+_lock = threading.Lock()
+
+
+def get_cached_solo(model):
+    """Return a copy of ``model.get_solo()``, reloaded only after the table was written."""
+    table = model._meta.db_table
+    record_tables(table)
+    # Read the stamp before the row: a write landing in between leaves the
+    # new row under the old stamp, which just reloads on the next call.
+    version = get_version(table_stamp(table))
+    cached = _instances.get(model)
+    if cached is None or cached[0] != version:
+        with _lock:
+            cached = _instances.get(model)
+            if cached is None or cached[0] != version:
+                cached = (version, model.get_solo())
+                _instances[model] = cached
+    return copy.copy(cached[1])
@@ -0,0 +1,85 @@
+"""
+Cache template fragments until the data they were rendered from changes.
+
+Like Django's ``{% cache %}``, but without a fixed expiry: each fragment
+is stored with the version stamps (``home.dependencies``) of the tables
+and rows it read, plus those of the apps or models named in ``depends``,
+and is reused only while none of them moved. ``depends`` covers objects
+the view fetched before the fragment renders; queries made inside the
+fragment are picked up automatically.
+
+The key ignores whether the request came from HTMX, so the full page and
+the partial of the same view share their fragments.
+
+Usage::
+
+    {% load fragment_cache %}
+    {% cachefragment "blog-sidebar" selected_categories selected_tags depends="blog" %}
+        ...
+    {% endcachefragment %}
+"""
+import hashlib
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+
+from home.dependencies import model_tables, record_stamps, render_tracked
+from home.versions import get_versions
+
+register = template.Library()
+
+
+def fragment_key(name, vary_on):
+    digest = hashlib.sha256(repr([name, *vary_on]).encode()).hexdigest()
+    return f'fragment:{digest}'
+
+
+class CacheFragmentNode(template.Node):
+    def __init__(self, nodelist, name, vary_on, depends):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+        self.depends = depends
+
+    def render(self, context):
+        if settings.FRAGMENT_CACHE_TIMEOUT <= 0:
+            return self.nodelist.render(context)
+
+        key = fragment_key(self.name.resolve(context), [var.resolve(context) for var in self.vary_on])
+        entry = cache.get(key)
+        if entry is not None:
+            stamps, html = entry
+            if get_versions(*stamps) == stamps:
+                record_stamps(*stamps)
+                return html
+
+        tables = set()
+        for label in self.depends.resolve(context).split():
+            tables |= model_tables(label)
+        html, stamps = render_tracked(lambda: self.nodelist.render(context), tables)
+        if stamps is not None:
+            cache.set(key, (stamps, html), settings.FRAGMENT_CACHE_TIMEOUT)
+        return html
+
+
+@register.tag('cachefragment')
+def do_cachefragment(parser, token):
+    """
+    Cache the enclosed template until its data changes.
+    Usage: {% cachefragment "name" [vary_on ...] [depends="app app.Model"] %}...{% endcachefragment %}
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f'{bits[0]!r} tag requires at least a fragment name.')
+    depends = parser.compile_filter('""')
+    if bits[-1].startswith('depends='):
+        depends = parser.compile_filter(bits.pop()[len('depends='):])
+    nodelist = parser.parse(('endcachefragment',))
+    parser.delete_first_token()
+    return CacheFragmentNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+        depends,
+    )
@@ -0,0 +1,55 @@
+"""
+Responsive ``<picture>`` markup for uploaded images (``home.renditions``).
+
+Usage::
+
+    {% load responsive_images %}
+    {% responsive_image post.featured_image sizes="(min-width: 768px) 380px, 100vw" class="card-img-top" alt=post.title %}
+
+renders AVIF and WebP ``<source>``s and a JPEG (or PNG) ``<img>``, each
+with a ``srcset`` of every rendition width and the given ``sizes``. Other
+keyword arguments become attributes of the ``<img>``. Until the
+renditions exist the original upload is used as is.
+"""
+from django import template
+from django.core.files.storage import default_storage
+from django.forms.utils import flatatt
+from django.utils.html import format_html, format_html_join
+
+from home.dependencies import record_stamps
+from home.renditions import get_renditions, rendition_stamp
+
+register = template.Library()
+
+
+def _srcset(variants):
+    return ', '.join(f'{default_storage.url(path)} {width}w' for width, path in variants)
+
+
+@register.simple_tag
+def responsive_image(image, sizes='100vw', **attrs):
+    """
+    Render an ImageField file as a <picture> offering its renditions.
+    Usage: {% responsive_image image [sizes="..."] [attribute=value ...] %}
+    """
+    if not image:
+        return ''
+    renditions = get_renditions(image.name)
+    if renditions is None:
+        # Re-render cached pages once the renditions are ready
+        record_stamps(rendition_stamp(image.name))
+    if not renditions or not renditions['formats']:
+        return format_html('<img src="{}"{}>', image.url, flatatt(attrs))
+
+    *sources, (_, fallback) = renditions['formats']
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        format_html_join(
+            '', '<source type="{}" srcset="{}" sizes="{}">',
+            ((mime_type, _srcset(variants), sizes) for mime_type, variants in sources),
+        ),
+        default_storage.url(fallback[-1][1]),
+        _srcset(fallback),
+        sizes,
+        flatatt(attrs),
+    )
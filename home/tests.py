@@ -1,3 +1,316 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from PIL import Image
+
+from blog.models import BlogPost
+from projects.models import (
+    MathPhysicsProject, ProjectFeature, ProjectLink, ProjectTeammate, ProjectVideo, SoftwareProject, WebProject,
+)
+from resume.models import Resume, WorkExperience, WorkExperienceItem
+
+from . import page_cache, renditions, singletons
+from .locks import RenderLock
+from .models import SiteConfiguration
+from .singletons import get_cached_solo
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class PageCacheMixin:
+    """Page caching on, with a private cache and lock directory per test."""
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(override_settings(
+            CACHES=LOCMEM_CACHE, PAGE_CACHE_TIMEOUT=300, FRAGMENT_CACHE_TIMEOUT=300,
+            # Re-render invalidated pages in the request instead of in the background
+            PAGE_CACHE_STALE_GRACE=-1,
+            PAGE_CACHE_LOCK_DIR=self.enterContext(tempfile.TemporaryDirectory()),
+        ))
+        cache.clear()
+
+    def rendered(self, *urls):
+        """Request ``urls`` in turn; return those whose response had to be rendered."""
+        found = []
+        for url in urls:
+            with mock.patch.object(page_cache, 'render_and_cache', wraps=page_cache.render_and_cache) as render:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            if render.called:
+                found.append(url)
+        return found
+
+
+class PageCacheTestCase(PageCacheMixin, TestCase):
+    pass
+
+
+class SelectiveInvalidationTests(PageCacheTestCase):
+
+    PAGES = ('/', '/blog/', '/projects/')
+
+    @classmethod
+    def setUpTestData(cls):
+        resume = Resume.objects.create(name='Ada', headline='Engineer', location='Zagreb', about_text='-')
+        experience = WorkExperience.objects.create(
+            title='Engineer', company='Acme', location='Zagreb', start_date='2020', end_date='2024', resume=resume,
+        )
+        cls.item = WorkExperienceItem.objects.create(text='Built things', experience=experience)
+
+    def setUp(self):
+        super().setUp()
+        # Stamps first read mid-render start out newer than the render, so
+        # a page is cached from its second render at the latest.
+        self.rendered(*self.PAGES)
+        self.rendered(*self.PAGES)
+        self.assertEqual(self.rendered(*self.PAGES), [])
+
+    def test_save_rerenders_only_home(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.text = 'Built more things'
+            self.item.save()
+        self.assertEqual(self.rendered(*self.PAGES), ['/'])
+        self.assertContains(self.client.get('/'), 'Built more things')
+
+    def test_queryset_update_rerenders_only_home(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            WorkExperienceItem.objects.filter(pk=self.item.pk).update(text='Shipped things')
+        self.assertEqual(self.rendered(*self.PAGES), ['/'])
+        self.assertContains(self.client.get('/'), 'Shipped things')
+
+
+class CacheKeyTests(PageCacheTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        BlogPost.objects.create(title='Visible post', excerpt='-', content='Text.', published=True)
+        SoftwareProject.objects.create(title='Compiler', short_description='-', long_description='-', css_id='a')
+        WebProject.objects.create(title='Storefront', short_description='-', long_description='-', css_id='b')
+
+    def test_empty_filter_is_the_unfiltered_list(self):
+        # ?category= is left out of the key, so the view must ignore it too
+        self.assertContains(self.client.get('/blog/?category='), 'Visible post')
+        self.assertContains(self.client.get('/blog/'), 'Visible post')
+
+    def test_order_of_repeated_parameters_does_not_matter(self):
+        # Both orders share one entry, so each must render that entry's page
+        first = self.client.get('/projects/?type=web&type=software')
+        cache.clear()
+        self.assertEqual(self.client.get('/projects/?type=software&type=web').content, first.content)
+
+    @override_settings(SITE_URL='')
+    def test_tracking_parameters_stay_out_of_share_links(self):
+        self.client.get('/blog/visible-post/?utm_source=newsletter&fbclid=abc')
+        response = self.client.get('/blog/visible-post/')
+        self.assertContains(response, 'url=http%3A//testserver/blog/visible-post/&')
+        self.assertNotContains(response, 'utm_source')
+        self.assertNotContains(response, 'fbclid')
+
+
+class ConditionalGetTests(PageCacheTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.post = BlogPost.objects.create(title='Visible post', excerpt='-', content='Text.', published=True)
+
+    def setUp(self):
+        super().setUp()
+        self.rendered('/blog/', '/blog/')
+        self.etag = self.client.get('/blog/')['ETag']
+
+    def test_matching_etag_gets_304_without_rendering(self):
+        with mock.patch.object(page_cache, 'render_and_cache', wraps=page_cache.render_and_cache) as render:
+            response = self.client.get('/blog/', HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], self.etag)
+        render.assert_not_called()
+
+    def test_etag_changes_with_the_page(self):
+        self.assertNotEqual(self.client.get('/blog/', HTTP_HX_REQUEST='true')['ETag'], self.etag)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.title = 'Renamed post'
+            self.post.save()
+        response = self.client.get('/blog/', HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], self.etag)
+        self.assertContains(response, 'Renamed post')
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CachedSingletonTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.enterContext(mock.patch.dict(singletons._instances, clear=True))
+
+    def test_configuration_is_reloaded_only_after_a_save(self):
+        self.assertEqual(get_cached_solo(SiteConfiguration).full_name, 'Your Name')
+        with self.assertNumQueries(0):
+            config = get_cached_solo(SiteConfiguration)
+        # Callers get a copy they cannot change the cached instance through
+        config.full_name = 'Changed in place'
+        self.assertEqual(get_cached_solo(SiteConfiguration).full_name, 'Your Name')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            config = SiteConfiguration.get_solo()
+            config.full_name = 'Ada Lovelace'
+            config.save()
+        self.assertEqual(get_cached_solo(SiteConfiguration).full_name, 'Ada Lovelace')
+        with self.assertNumQueries(0):
+            get_cached_solo(SiteConfiguration)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, PAGE_CACHE_TIMEOUT=0, FRAGMENT_CACHE_TIMEOUT=0)
+class HomePageQueryCountTests(TestCase):
+
+    PROJECT_TYPES = (SoftwareProject, WebProject, MathPhysicsProject)
+
+    def setUp(self):
+        cache.clear()
+        Resume.objects.create(name='Ada', headline='Engineer', location='Zagreb', about_text='-')
+
+    def add_projects(self, total):
+        """Create projects of every type, each with a row in every prefetched set, up to ``total``."""
+        for n in range(ProjectLink.objects.count(), total):
+            project = self.PROJECT_TYPES[n % 3].objects.create(
+                title=f'Project {n}', short_description='-', long_description='-', css_id=f'project-{n}',
+            )
+            ProjectFeature.objects.create(text='Fast', project=project)
+            ProjectTeammate.objects.create(text='Grace', project=project)
+            ProjectVideo.objects.create(video='https://example.com/video', project=project)
+            ProjectLink.objects.create(
+                project=project, link_type=ProjectLink.GITHUB,
+                exact_url='https://github.com/example', pretty_url='github.com/example', text='Code',
+            )
+
+    def test_query_count_does_not_grow_with_projects(self):
+        # One query for the projects as their subclasses, one per prefetch
+        self.client.get('/')  # caches the singletons and the resume document
+        for total in (3, 300):
+            self.add_projects(total)
+            with self.subTest(projects=total), self.assertNumQueries(7):
+                response = self.client.get('/')
+            self.assertContains(response, f'Project {total - 1}')
+
+
+class SingleFlightTests(PageCacheMixin, TransactionTestCase):
+
+    REQUESTS = 8
+
+    def test_concurrent_requests_for_a_cold_page_render_it_once(self):
+        # Create the singleton the page would otherwise insert mid-render,
+        # then start from a cold cache: no page, no version stamps
+        SiteConfiguration.get_solo()
+        cache.clear()
+        renders = []
+        render_and_cache = page_cache.render_and_cache
+
+        def slow_render_and_cache(key, render):
+            renders.append(key)
+            time.sleep(0.3)  # long enough for every other request to arrive
+            return render_and_cache(key, render)
+
+        start = threading.Barrier(self.REQUESTS)
+        responses = []
+
+        def request():
+            start.wait()
+            try:
+                responses.append(Client().get('/projects/'))
+            finally:
+                connections.close_all()
+
+        with mock.patch.object(page_cache, 'render_and_cache', side_effect=slow_render_and_cache):
+            threads = [threading.Thread(target=request) for _ in range(self.REQUESTS)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(renders), 1)
+        self.assertEqual([response.status_code for response in responses], [200] * self.REQUESTS)
+        self.assertEqual(len({response.content for response in responses}), 1)
+
+
+class RenderLockTests(SimpleTestCase):
+
+    def setUp(self):
+        self.lock_dir = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(PAGE_CACHE_LOCK_DIR=self.lock_dir))
+
+    def test_lock_is_exclusive_per_key(self):
+        held = RenderLock('page:a')
+        self.assertTrue(held.acquire())
+        self.assertFalse(RenderLock('page:a').acquire())
+        # Keys never share a lock file, so other pages are not held up
+        others = [RenderLock(f'page:{n}') for n in range(200)]
+        self.assertTrue(all(lock.acquire() for lock in others))
+        for lock in [held, *others]:
+            lock.release()
+        self.assertTrue(RenderLock('page:a').acquire())
+
+    def test_released_lock_files_are_removed(self):
+        lock = RenderLock('page:a')
+        lock.acquire()
+        self.assertTrue(os.path.exists(lock.path))
+        lock.release()
+        self.assertEqual(os.listdir(self.lock_dir), [])
+
+    def test_waiter_on_a_removed_file_still_excludes_newcomers(self):
+        held = RenderLock('page:a')
+        held.acquire()
+        waiter = RenderLock('page:a')
+        acquired = []
+        thread = threading.Thread(target=lambda: acquired.append(waiter.acquire(timeout=5)))
+        thread.start()
+        time.sleep(0.1)  # the waiter has opened the file that release() deletes
+        held.release()
+        thread.join()
+        self.assertEqual(acquired, [True])
+        self.assertFalse(RenderLock('page:a').acquire())
+        waiter.release()
+
+
+class RenditionCheckTests(SimpleTestCase):
+
+    def setUp(self):
+        self.enterContext(override_settings(
+            CACHES=LOCMEM_CACHE, IMAGE_RENDITION_WIDTHS=[320, 640], IMAGE_RENDITION_CHECK_INTERVAL=300,
+            MEDIA_ROOT=self.enterContext(tempfile.TemporaryDirectory()),
+        ))
+        cache.clear()
+        buffer = io.BytesIO()
+        Image.new('RGB', (400, 300), 'teal').save(buffer, 'JPEG')
+        self.name = default_storage.save('projects/photo.jpg', ContentFile(buffer.getvalue()))
+        self.manifest = renditions.generate_renditions(self.name)
+        self.paths = [path for _, variants in self.manifest['formats'] for _, path in variants]
+        self.schedule = self.enterContext(mock.patch.object(renditions, 'schedule_renditions'))
+
+    def get_renditions(self):
+        with mock.patch.object(default_storage, 'exists', wraps=default_storage.exists) as exists:
+            manifest = renditions.get_renditions(self.name)
+        return manifest, exists.call_count
+
+    def test_storage_is_checked_once_per_interval(self):
+        self.assertEqual(self.get_renditions(), (self.manifest, len(self.paths)))
+        for _ in range(3):
+            self.assertEqual(self.get_renditions(), (self.manifest, 0))
+        self.schedule.assert_not_called()
+
+    def test_missing_rendition_is_noticed_after_the_interval(self):
+        with self.settings(IMAGE_RENDITION_CHECK_INTERVAL=0):
+            self.assertEqual(self.get_renditions()[0], self.manifest)
+            default_storage.delete(self.paths[0])
+            self.assertEqual(self.get_renditions()[0], None)
+        self.schedule.assert_called_once_with(self.name)
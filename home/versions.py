@@ -0,0 +1,84 @@
+"""
+Content version stamps shared by every worker process.
+
+A version stamp is a nanosecond timestamp stored in the default cache
+under ``version:<name>``. Code that caches something derived from the
+database (in process memory or in the cache itself) remembers the stamp
+it was built against and rebuilds when the stamp moves. Writers call
+:func:`bump_version` after their transaction commits.
+
+The cache has to be shared between processes (see ``CACHES`` in
+settings) for a bump in one gunicorn worker to reach the others.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+_local = threading.local()
+
+
+def _key(name):
+    return f'version:{name}'
+
+
+@contextmanager
+def missing_versions_start_at(stamp):
+    """Make :func:`get_versions` in the block initialise missing stamps to ``stamp``.
+
+    Used while rendering, so a stamp first read by code nested in the
+    render does not look as if it moved mid-render. Nested blocks keep
+    the outermost ``stamp``.
+    """
+    outer = getattr(_local, 'initial', None)
+    if outer is None:
+        _local.initial = stamp
+    try:
+        yield
+    finally:
+        _local.initial = outer
+
+
+def get_versions(*names, initial=None):
+    """Return ``{name: stamp}``, initialising missing stamps to ``initial``.
+
+    ``initial`` defaults to the one set by :func:`missing_versions_start_at`,
+    else now. It must not be earlier than anything the caller cached under
+    a previous value of the stamp, or a stamp lost from the cache could
+    come back with a value someone already saw.
+    """
+    if initial is None:
+        initial = getattr(_local, 'initial', None)
+    keys = {_key(name): name for name in names}
+    found = cache.get_many(keys)
+    versions = {keys[key]: value for key, value in found.items()}
+    for key, name in keys.items():
+        if key not in found:
+            stamp = time.time_ns() if initial is None else initial
+            # Another process may have initialised it first; keep theirs.
+            if not cache.add(key, stamp, timeout=None):
+                stamp = cache.get(key, stamp)
+            versions[name] = stamp
+    return versions
+
+
+def get_version(name):
+    return get_versions(name)[name]
+
+
+def bump_version(*names):
+    """Move the stamps for ``names`` forward now."""
+    stamp = time.time_ns()
+    cache.set_many({_key(name): stamp for name in names}, timeout=None)
+
+
+def bump_version_on_commit(*names):
+    """Bump once the current transaction commits (immediately in autocommit).
+
+    Bumping earlier would let another process rebuild from the
+    not-yet-committed state and cache it under the new stamp.
+    """
+    transaction.on_commit(lambda: bump_version(*names))
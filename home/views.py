@@ -4,26 +4,41 @@ from django.core.mail import send_mail
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.conf import settings
-from projects.models import SoftwareProject, MathPhysicsProject, WebProject
-from resume.models import Resume, SkillGroup
+from django.utils.functional import SimpleLazyObject
+from projects.models import Project, SoftwareProject, MathPhysicsProject, WebProject
+from resume.document import get_resume_document
+from resume.models import Resume
+from .page_cache import cache_anonymous_page
+from .singletons import get_cached_solo
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Related sets the project cards render, loaded with one query per set for
+# all projects (video counts included) instead of per card.
+PROJECT_CARD_PREFETCH = (
+    'projectvideo_set', 'projectimage_set', 'projectfeature_set',
+    'projectspecialthanks_set', 'projectteammate_set', 'projectlink_set',
+)
+
+
+def _projects_of_type(projects, model):
+    return SimpleLazyObject(lambda: [project for project in projects if isinstance(project, model)])
+
+
 # Create your views here.
+@cache_anonymous_page()
 def home_page(request):
-    software_projects = SoftwareProject.objects.order_by('-pub_date')
-    mathphysics_projects = MathPhysicsProject.objects.order_by('-pub_date')
-    web_projects = WebProject.objects.order_by('-pub_date')
-    resume = Resume.objects.first()  # Use .first() instead of [0] to handle empty queryset
+    # One query for all three lists, run only if the projects fragment renders
+    projects = Project.objects.downcast().prefetch_related(*PROJECT_CARD_PREFETCH).order_by('-pub_date')
+    resume = get_cached_solo(Resume)
     
-    skill_groups = SkillGroup.objects.all()
     context = {
-        'software_projects': software_projects,
-        'mathphysics_projects': mathphysics_projects,
-        'web_projects': web_projects,
+        'software_projects': _projects_of_type(projects, SoftwareProject),
+        'mathphysics_projects': _projects_of_type(projects, MathPhysicsProject),
+        'web_projects': _projects_of_type(projects, WebProject),
         'resume': resume,
-        'skill_groups': skill_groups,
+        'resume_document': get_resume_document(),
         'active_page': 'home',
     }
     
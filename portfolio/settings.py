@@ -113,6 +113,41 @@ DATABASES = {
     }
 }
 
+# Cache
+# Shared by all gunicorn workers so content version stamps (home.versions)
+# bumped in one process invalidate in-memory data in the others; a
+# per-process LocMemCache would not. Defaults to a file cache next to the
+# database; point CACHE_BACKEND/CACHE_LOCATION at e.g. Redis or Memcached
+# instead if available.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / 'db' / 'cache')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '5000')),
+        },
+    }
+}
+
+# Full-page cache for anonymous visitors (home.page_cache), in seconds; 0
+# turns it off. Entries are invalidated by content version stamps, so the
+# timeout only bounds how long superseded pages linger. Off by default with
+# DEBUG so template edits show up immediately.
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', '0' if DEBUG else '86400'))
+# For this many seconds after a cached page is invalidated, visitors keep
+# getting the old copy while one background render replaces it.
+PAGE_CACHE_STALE_GRACE = int(os.getenv('PAGE_CACHE_STALE_GRACE', '30'))
+# Longest a request waits for another worker's render of the same page
+# before rendering it itself.
+PAGE_CACHE_LOCK_TIMEOUT = int(os.getenv('PAGE_CACHE_LOCK_TIMEOUT', '10'))
+# flock() files coordinating those renders; must be shared by all workers.
+PAGE_CACHE_LOCK_DIR = os.getenv('PAGE_CACHE_LOCK_DIR', str(BASE_DIR / 'db' / 'locks'))
+
+# Template fragments cached with {% cachefragment %} (home.templatetags.
+# fragment_cache), in seconds; 0 turns it off. Like the page cache, entries
+# are invalidated by version stamps and off by default with DEBUG.
+FRAGMENT_CACHE_TIMEOUT = int(os.getenv('FRAGMENT_CACHE_TIMEOUT', '0' if DEBUG else '86400'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -175,6 +210,16 @@ STORAGES = {
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Widths in pixels of the resized copies made of uploaded images for
+# responsive srcsets (home.renditions), in AVIF, WebP and JPEG
+IMAGE_RENDITION_WIDTHS = [
+    int(width) for width in os.getenv('IMAGE_RENDITION_WIDTHS', '320,640,960,1280,1920').split(',')
+]
+
+# Seconds between checks that an image's renditions are all still in
+# storage; renders in between trust the last check
+IMAGE_RENDITION_CHECK_INTERVAL = int(os.getenv('IMAGE_RENDITION_CHECK_INTERVAL', '300'))
+
 # CKEditor 5 Configuration
 CKEDITOR_5_CONFIGS = {
     'default': {
@@ -329,3 +374,23 @@ MARKDOWNX_MARKDOWN_EXTENSION_CONFIGS = {}
 MARKDOWNX_UPLOAD_CONTENT_TYPES = ['image/jpeg', 'image/png', 'image/gif', 'image/webp']
 MARKDOWNX_IMAGE_MAX_SIZE = {'size': (1920, 1920), 'quality': 90}
 MARKDOWNX_MEDIA_PATH = 'markdownx/'  # Uploaded images go to media/markdownx/
+
+# Blog math rendering
+# 'katex' pre-renders formulas on the server with Node + KaTeX when posts are
+# saved (falling back to client-side typesetting if Node/KaTeX is missing);
+# 'client' always leaves typesetting to KaTeX auto-render in the browser.
+BLOG_MATH_RENDERER = os.getenv('BLOG_MATH_RENDERER', 'katex')
+BLOG_KATEX_NODE = os.getenv('BLOG_KATEX_NODE', 'node')
+BLOG_KATEX_MODULE = os.getenv('BLOG_KATEX_MODULE', os.path.join(BASE_DIR, 'node_modules', 'katex'))
+BLOG_KATEX_TIMEOUT = int(os.getenv('BLOG_KATEX_TIMEOUT', '30'))
+
+# Blog code highlighting
+# 'pygments' highlights fenced code when posts are saved (styles in
+# blog/css/pygments.css); 'client' leaves it to highlight.js in the browser.
+BLOG_CODE_HIGHLIGHTER = os.getenv('BLOG_CODE_HIGHLIGHTER', 'pygments')
+
+# Blog list pagination
+# 'pages' shows numbered pages; 'cursor' uses keyset pagination on
+# (created_date, id) with newer/older links that stay stable while posts are
+# published. Both are served from the in-memory facet index (blog.facets).
+BLOG_PAGINATION = os.getenv('BLOG_PAGINATION', 'pages')
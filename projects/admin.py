@@ -21,55 +21,29 @@ class VideoInline(admin.StackedInline):
     model = ProjectVideo
     extra = 1
 
-class GithubLinkInline(admin.StackedInline):
-    model = GitHubProjectLink
-    extra = 1
-
-class CompanyLinkInline(admin.StackedInline):
-    model = CompanyProjectLink
-    extra = 1
-
-class LiveLinkInline(admin.StackedInline):
-    model = LiveProjectLink
-    extra = 1
-
-class InstitutionLinkInline(admin.StackedInline):
-    model = InstitutionProjectLink
-    extra = 1
-
-class WebsiteLinkInline(admin.StackedInline):
-    model = WebsiteProjectLink
-    extra = 1
-
-class PlayStoreLinkInline(admin.StackedInline):
-    model = PlayStoreProjectLink
+class LinkInline(admin.StackedInline):
+    model = ProjectLink
     extra = 1
 
 class MathPhysicsProjectAdmin(admin.ModelAdmin):
     model = MathPhysicsProject
     inlines = [
         FeatureInline, SpecialThanksInline, 
-        TeammatesInline, ImageInline, VideoInline,
-        CompanyLinkInline, WebsiteLinkInline, GithubLinkInline,
-        InstitutionLinkInline, LiveLinkInline, PlayStoreLinkInline,
+        TeammatesInline, ImageInline, VideoInline, LinkInline,
     ]
 
 class WebProjectAdmin(admin.ModelAdmin):
     model = WebProject
     inlines = [
         FeatureInline, SpecialThanksInline, 
-        TeammatesInline, ImageInline, VideoInline,
-        CompanyLinkInline, WebsiteLinkInline, GithubLinkInline,
-        InstitutionLinkInline, LiveLinkInline, PlayStoreLinkInline,
+        TeammatesInline, ImageInline, VideoInline, LinkInline,
     ]
 
 class SoftwareProjectAdmin(admin.ModelAdmin):
     model = SoftwareProject
     inlines = [
         FeatureInline, SpecialThanksInline, 
-        TeammatesInline, ImageInline, VideoInline,
-        CompanyLinkInline, WebsiteLinkInline, GithubLinkInline,
-        InstitutionLinkInline, LiveLinkInline, PlayStoreLinkInline,
+        TeammatesInline, ImageInline, VideoInline, LinkInline,
     ]
 
 admin.site.register(SoftwareProject, SoftwareProjectAdmin)
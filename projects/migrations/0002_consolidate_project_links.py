@@ -0,0 +1,97 @@
+# Generated by Django 4.2.28 on 2026-10-17 14:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+# The multi-table ProjectLink subclasses and the link type each becomes.
+LINK_MODELS = (
+    ('GitHubProjectLink', 'github'),
+    ('CompanyProjectLink', 'company'),
+    ('LiveProjectLink', 'live'),
+    ('InstitutionProjectLink', 'institution'),
+    ('WebsiteProjectLink', 'website'),
+    ('PlayStoreProjectLink', 'play_store'),
+)
+
+
+def merge_links(apps, schema_editor):
+    """Move each subclass row's project and type onto its ProjectLink row."""
+    ProjectLink = apps.get_model('projects', 'ProjectLink')
+    for model_name, link_type in LINK_MODELS:
+        model = apps.get_model('projects', model_name)
+        ProjectLink.objects.filter(pk__in=model.objects.values('pk')).update(
+            link_type=link_type,
+            linked_project_id=Subquery(model.objects.filter(pk=OuterRef('pk')).values('project_id')),
+        )
+    # Parent rows without a subclass row never showed up anywhere.
+    ProjectLink.objects.filter(linked_project__isnull=True).delete()
+
+
+def split_links(apps, schema_editor):
+    """Recreate the subclass rows from the typed ProjectLink rows."""
+    ProjectLink = apps.get_model('projects', 'ProjectLink')
+    link_models = {link_type: apps.get_model('projects', model_name) for model_name, link_type in LINK_MODELS}
+    for link in ProjectLink.objects.all():
+        child = link_models[link.link_type](
+            projectlink_ptr_id=link.pk, project_id=link.linked_project_id,
+            exact_url=link.exact_url, pretty_url=link.pretty_url, text=link.text,
+        )
+        # raw: the ProjectLink row already exists, only insert the subclass row
+        child.save_base(raw=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectlink',
+            name='link_type',
+            field=models.CharField(choices=[('github', 'GitHub'), ('company', 'Company'), ('live', 'Live project'), ('institution', 'Institution'), ('website', 'Website'), ('play_store', 'Play Store')], default='', max_length=20),
+            preserve_default=False,
+        ),
+        # Named apart from the subclasses' own ``project`` field until they are gone.
+        migrations.AddField(
+            model_name='projectlink',
+            name='linked_project',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='projects.project'),
+        ),
+        migrations.RunPython(merge_links, split_links),
+        migrations.DeleteModel(
+            name='CompanyProjectLink',
+        ),
+        migrations.DeleteModel(
+            name='GitHubProjectLink',
+        ),
+        migrations.DeleteModel(
+            name='InstitutionProjectLink',
+        ),
+        migrations.DeleteModel(
+            name='LiveProjectLink',
+        ),
+        migrations.DeleteModel(
+            name='PlayStoreProjectLink',
+        ),
+        migrations.DeleteModel(
+            name='WebsiteProjectLink',
+        ),
+        migrations.RenameField(
+            model_name='projectlink',
+            old_name='linked_project',
+            new_name='project',
+        ),
+        migrations.AlterField(
+            model_name='projectlink',
+            name='project',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='projects.project'),
+        ),
+        migrations.AddIndex(
+            model_name='projectlink',
+            index=models.Index(fields=['project', 'link_type'], name='project_link_type_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.28 on 2026-10-17 12:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0002_consolidate_project_links'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['-pub_date', '-id'], name='project_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['technology', '-pub_date', '-id'], name='project_technology_idx'),
+        ),
+    ]
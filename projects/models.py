@@ -1,6 +1,44 @@
 from django.db import models
+from django.db.models.query import ModelIterable
 from django.utils import timezone
 
+
+def _subclass_accessors(model):
+    """Accessor names of the multi-table subclasses of ``model``."""
+    return [rel.get_accessor_name() for rel in model._meta.related_objects if rel.parent_link]
+
+
+class SubclassIterable(ModelIterable):
+    """Yield the subclass instance joined onto each row, if there is one."""
+
+    def __iter__(self):
+        accessors = _subclass_accessors(self.queryset.model)
+        for obj in super().__iter__():
+            for accessor in accessors:
+                child = obj._state.fields_cache.get(accessor)
+                if child is not None:
+                    yield child
+                    break
+            else:
+                yield obj
+
+
+class ProjectQuerySet(models.QuerySet):
+    def downcast(self):
+        """
+        Return each project as its SoftwareProject, WebProject or
+        MathPhysicsProject instance, LEFT JOINing the subclass tables into
+        the same query instead of one lookup per row.
+        """
+        accessors = _subclass_accessors(self.model)
+        if not accessors:
+            # Already a subclass; select_related() without names would follow every foreign key
+            return self._chain()
+        clone = self.select_related(*accessors)
+        clone._iterable_class = SubclassIterable
+        return clone
+
+
 class Project(models.Model):
     title = models.CharField(max_length=200)
     short_description = models.TextField()
@@ -9,9 +47,46 @@ class Project(models.Model):
     css_id = models.CharField(max_length=75)
     pub_date = models.DateTimeField(default=timezone.now)
 
+    objects = ProjectQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # projects_list: newest first, optionally filtered by technology
+            models.Index(fields=['-pub_date', '-id'], name='project_pub_date_idx'),
+            models.Index(fields=['technology', '-pub_date', '-id'], name='project_technology_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
+    def _links(self, link_type):
+        # Filtered in Python so prefetch_related('projectlink_set') covers every type
+        return [link for link in self.projectlink_set.all() if link.link_type == link_type]
+
+    @property
+    def github_links(self):
+        return self._links(ProjectLink.GITHUB)
+
+    @property
+    def company_links(self):
+        return self._links(ProjectLink.COMPANY)
+
+    @property
+    def live_links(self):
+        return self._links(ProjectLink.LIVE)
+
+    @property
+    def institution_links(self):
+        return self._links(ProjectLink.INSTITUTION)
+
+    @property
+    def website_links(self):
+        return self._links(ProjectLink.WEBSITE)
+
+    @property
+    def play_store_links(self):
+        return self._links(ProjectLink.PLAY_STORE)
+
 class SoftwareProject(Project):
     project_type = models.CharField(max_length=30, default='Software Project')
 
@@ -23,28 +98,36 @@ class MathPhysicsProject(Project):
     preview_type = models.CharField(max_length=10, default='pdf')
 
 class ProjectLink(models.Model):
+    GITHUB = 'github'
+    COMPANY = 'company'
+    LIVE = 'live'
+    INSTITUTION = 'institution'
+    WEBSITE = 'website'
+    PLAY_STORE = 'play_store'
+    LINK_TYPES = [
+        (GITHUB, 'GitHub'),
+        (COMPANY, 'Company'),
+        (LIVE, 'Live project'),
+        (INSTITUTION, 'Institution'),
+        (WEBSITE, 'Website'),
+        (PLAY_STORE, 'Play Store'),
+    ]
+
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, db_index=False)
+    link_type = models.CharField(max_length=20, choices=LINK_TYPES)
     exact_url = models.CharField(max_length=100)
     pretty_url = models.CharField(max_length=100)
     text = models.CharField(max_length=100)
 
-class GitHubProjectLink(ProjectLink):
-    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    class Meta:
+        indexes = [
+            # Also serves lookups by project alone, like prefetching links
+            models.Index(fields=['project', 'link_type'], name='project_link_type_idx'),
+        ]
 
-class CompanyProjectLink(ProjectLink):
-    project = models.ForeignKey(Project, on_delete=models.CASCADE)
-
-class LiveProjectLink(ProjectLink):
-    project = models.ForeignKey(Project, on_delete=models.CASCADE)
-
-class InstitutionProjectLink(ProjectLink):
-    project = models.ForeignKey(Project, on_delete=models.CASCADE)
-
-class WebsiteProjectLink(ProjectLink):
-    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    def __str__(self):
+        return self.pretty_url
 
-class PlayStoreProjectLink(ProjectLink):
-    project = models.ForeignKey(Project, on_delete=models.CASCADE)
-    
 class ProjectFeature(models.Model):
     text = models.CharField(max_length=50)
     project = models.ForeignKey(Project, on_delete=models.CASCADE)
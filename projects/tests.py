@@ -1,3 +1,172 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .models import MathPhysicsProject, Project, SoftwareProject, WebProject
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class ConsolidateProjectLinksMigrationTests(TransactionTestCase):
+    """0002 folds the per-type ProjectLink subclasses into ``link_type``, and back."""
+
+    before = [('projects', '0001_initial')]
+    after = [('projects', '0002_consolidate_project_links')]
+
+    # Subclass in 0001 -> (link_type, exact_url, pretty_url, text)
+    LINKS = {
+        'GitHubProjectLink': ('github', 'https://github.com/a/b', 'github.com/a/b', 'Source'),
+        'CompanyProjectLink': ('company', 'https://acme.test', 'acme.test', 'Acme'),
+        'LiveProjectLink': ('live', 'https://b.test', 'b.test', 'Try it'),
+        'InstitutionProjectLink': ('institution', 'https://uni.test', 'uni.test', 'University'),
+        'WebsiteProjectLink': ('website', 'https://site.test', 'site.test', 'Website'),
+        'PlayStoreProjectLink': ('play_store', 'https://play.test/b', 'play.test', 'Get it'),
+    }
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+        super().tearDown()
+
+    def link_rows(self, apps):
+        ProjectLink = apps.get_model('projects', 'ProjectLink')
+        return sorted(ProjectLink.objects.values_list('project__title', 'link_type', 'exact_url', 'pretty_url', 'text'))
+
+    def test_links_keep_their_type_project_and_text(self):
+        apps = self.migrate(self.before)
+        Project = apps.get_model('projects', 'Project')
+        first = Project.objects.create(title='First', short_description='-', long_description='-', css_id='first')
+        second = Project.objects.create(title='Second', short_description='-', long_description='-', css_id='second')
+        for i, (model_name, (_, exact_url, pretty_url, text)) in enumerate(self.LINKS.items()):
+            apps.get_model('projects', model_name).objects.create(
+                project=(first, second)[i % 2], exact_url=exact_url, pretty_url=pretty_url, text=text,
+            )
+        # A parent row without a subclass row was never shown anywhere
+        apps.get_model('projects', 'ProjectLink').objects.create(exact_url='-', pretty_url='-', text='orphan')
+
+        expected = sorted(
+            (('First', 'Second')[i % 2], link_type, exact_url, pretty_url, text)
+            for i, (link_type, exact_url, pretty_url, text) in enumerate(self.LINKS.values())
+        )
+        self.assertEqual(self.link_rows(self.migrate(self.after)), expected)
+
+        apps = self.migrate(self.before)
+        for i, (model_name, (_, exact_url, pretty_url, text)) in enumerate(self.LINKS.items()):
+            with self.subTest(model=model_name):
+                link = apps.get_model('projects', model_name).objects.get()
+                self.assertEqual(
+                    (link.project.title, link.exact_url, link.pretty_url, link.text),
+                    (('First', 'Second')[i % 2], exact_url, pretty_url, text),
+                )
+        self.assertEqual(apps.get_model('projects', 'ProjectLink').objects.count(), len(self.LINKS))
+
+        # Forward again from the restored rows
+        self.assertEqual(self.link_rows(self.migrate(self.after)), expected)
+
+
+class DowncastTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for i, model in enumerate((SoftwareProject, WebProject, MathPhysicsProject) * 3):
+            model.objects.create(title=f'{model.__name__} {i}', short_description='-', long_description='-', css_id=f'p{i}')
+        Project.objects.create(title='Plain', short_description='-', long_description='-', css_id='plain')
+
+    def test_subclasses_come_from_one_query(self):
+        with self.assertNumQueries(1):
+            projects = list(Project.objects.downcast().order_by('pk'))
+            # Subclass fields are already loaded
+            types = [getattr(project, 'project_type', None) for project in projects]
+        self.assertEqual(
+            [type(project) for project in projects],
+            [SoftwareProject, WebProject, MathPhysicsProject] * 3 + [Project],
+        )
+        self.assertEqual(types[:3], ['Software Project', 'Web/Mobile Project', 'Math & Physics Project'])
+
+    def test_subclass_querysets_are_left_alone(self):
+        with self.assertNumQueries(1):
+            projects = list(WebProject.objects.downcast())
+        self.assertEqual([type(project) for project in projects], [WebProject] * 3)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, PAGE_CACHE_TIMEOUT=0, FRAGMENT_CACHE_TIMEOUT=0)
+class ProjectsListTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        # 12 of each type, newest first; every third one is Python
+        for i in range(36):
+            model = (SoftwareProject, WebProject, MathPhysicsProject)[i % 3]
+            model.objects.create(
+                title=f'Project {i}', short_description='-', long_description='-', css_id=f'p{i}',
+                technology='Python' if i % 9 < 3 else 'Rust', pub_date=now - timedelta(days=i),
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def titles(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [project.title for project in response.context['page_obj']]
+
+    def test_pages_are_newest_first(self):
+        self.assertEqual(self.titles('/projects/'), [f'Project {i}' for i in range(10)])
+        self.assertEqual(self.titles('/projects/?page=4'), [f'Project {i}' for i in range(30, 36)])
+        # Out of range pages show the last one
+        self.assertEqual(self.titles('/projects/?page=99'), self.titles('/projects/?page=4'))
+
+    def test_type_filter(self):
+        response = self.client.get('/projects/?type=web&page=2')
+        self.assertEqual(response.context['selected_type'], 'web')
+        self.assertEqual(response.context['page_obj'].paginator.count, 12)
+        self.assertEqual([project.title for project in response.context['page_obj']], ['Project 31', 'Project 34'])
+        self.assertTrue(all(isinstance(project, WebProject) for project in response.context['page_obj']))
+
+    def test_technology_filter(self):
+        self.assertEqual(self.titles('/projects/?technology=Python&page=2'), ['Project 28', 'Project 29'])
+        self.assertEqual(
+            self.titles('/projects/?type=software&technology=Python'),
+            ['Project 0', 'Project 9', 'Project 18', 'Project 27'],
+        )
+
+    def test_unknown_type_lists_all_projects(self):
+        response = self.client.get('/projects/?type=hardware')
+        self.assertEqual(response.context['selected_type'], '')
+        self.assertEqual(response.context['filter_query'], '')
+        self.assertEqual(response.context['page_obj'].paginator.count, 36)
+        self.assertEqual(
+            [type(project) for project in response.context['page_obj']][:3], [SoftwareProject, WebProject, MathPhysicsProject],
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHE, PAGE_CACHE_TIMEOUT=0, FRAGMENT_CACHE_TIMEOUT=0)
+class ProjectDetailTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = MathPhysicsProject.objects.create(
+            title='Lattice QCD', short_description='-', long_description='-', css_id='qcd',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_detail_shows_the_subclass(self):
+        response = self.client.get(f'/projects/{self.project.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.context['project'], MathPhysicsProject)
+        self.assertContains(response, 'Lattice QCD')
+
+    def test_unknown_project_is_404(self):
+        self.assertEqual(self.client.get(f'/projects/{self.project.pk + 1}/').status_code, 404)
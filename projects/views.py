@@ -1,19 +1,73 @@
-from django.shortcuts import render
-from projects.models import Project
+from urllib.parse import urlencode
+
+from django.core.paginator import Paginator
+from django.db.models import Prefetch
+from django.shortcuts import get_object_or_404, render
+from home.page_cache import cache_anonymous_page
+from projects.models import MathPhysicsProject, Project, ProjectImage, SoftwareProject, WebProject
+
+
+PROJECTS_PER_PAGE = 10
+
+# ?type= values, their labels and the subclass each selects
+PROJECT_TYPES = {
+    'software': ('Software', SoftwareProject),
+    'web': ('Web/Mobile', WebProject),
+    'math-physics': ('Math & Physics', MathPhysicsProject),
+}
+
+# Related sets project_detail renders
+PROJECT_DETAIL_PREFETCH = (
+    Prefetch('projectimage_set', queryset=ProjectImage.objects.order_by('pk')),
+)
+
 
 # Create your views here.
+@cache_anonymous_page(query_params=('type', 'technology', 'page'))
 def projects_list(request):
-    projects = Project.objects.all()
+    selected_type = request.GET.get('type', '')
+    selected_technology = request.GET.get('technology', '')
+
+    if selected_type in PROJECT_TYPES:
+        projects = PROJECT_TYPES[selected_type][1].objects.all()
+    else:
+        selected_type = ''
+        projects = Project.objects.downcast()
+    if selected_technology:
+        projects = projects.filter(technology=selected_technology)
+    # Cover images for the cards on the page, in one query
+    projects = projects.prefetch_related(
+        Prefetch('projectimage_set', queryset=ProjectImage.objects.order_by('pk'))
+    ).order_by('-pub_date', '-id')
+
+    paginator = Paginator(projects, PROJECTS_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    technologies = (
+        Project.objects.exclude(technology__isnull=True).exclude(technology='')
+        .order_by('technology').values_list('technology', flat=True).distinct()
+    )
+
     context = {
-        'projects': projects,
+        'page_obj': page_obj,
+        'page_range': paginator.get_elided_page_range(page_obj.number, on_each_side=2, on_ends=0),
+        'filter_query': urlencode([
+            (name, value) for name, value in (('type', selected_type), ('technology', selected_technology)) if value
+        ]),
+        'project_types': [(slug, label) for slug, (label, _) in PROJECT_TYPES.items()],
+        'technologies': technologies,
+        'selected_type': selected_type,
+        'selected_technology': selected_technology,
         'active_page': 'projects',
     }
     # Return partial template for HTMX requests
     template = 'projects/projects_list_partial.html' if request.htmx else 'projects/projects_list.html'
     return render(request, template, context)
 
+@cache_anonymous_page()
 def project_detail(request, pk):
-    project = Project.objects.get(pk=pk)
+    # One lookup by primary key resolves the subclass (or the 404); the
+    # page cache keys the result on that project's rows
+    project = get_object_or_404(Project.objects.downcast().prefetch_related(*PROJECT_DETAIL_PREFETCH), pk=pk)
     context = {
         'project': project,
         'active_page': 'projects',
@@ -0,0 +1,116 @@
+"""
+The resume sections of the home page as one precomputed document.
+
+Rendering the resume straight from the models walks a dozen related
+sets, one query each (plus one per skill group). Instead the whole
+aggregate is flattened into plain dicts and lists once, kept in the
+shared cache and in each worker's memory, and rebuilt when the version
+stamp of any table in the resume app moves (``home.dependencies``).
+Serving it costs one shared-cache read and no queries.
+"""
+import threading
+
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from home.dependencies import model_tables, record_tables, table_stamp
+from home.versions import get_versions
+
+from .models import (
+    AcademicExperienceItem, Resume, ResumeProjectExperienceItem, SkillGroup,
+    VolunteerExperienceItem, WorkExperienceItem,
+)
+
+
+CACHE_KEY = 'resume:document'
+
+_document = None
+_lock = threading.Lock()
+
+
+def _texts(items):
+    return [item.text for item in items]
+
+
+def _with_items(experiences, item_model):
+    """``experiences`` with their ``<item_model>_set`` prefetched in creation order."""
+    related_name = f'{item_model._meta.model_name}_set'
+    return experiences.prefetch_related(Prefetch(related_name, queryset=item_model.objects.order_by('pk')))
+
+
+def build_resume_document():
+    """Load the resume aggregate (about a dozen queries) into plain data."""
+    resume = Resume.get_solo()
+    skills = {}
+    for skill in resume.skill_set.order_by('pk'):
+        skills.setdefault(skill.skill_group_id, []).append(skill.skill)
+
+    return {
+        'expertise': _texts(resume.expertiseitem_set.order_by('pk')),
+        # Every group is listed, as before, even if this resume has no skills in it.
+        'skill_groups': [
+            {'name': group.skill_group, 'skills': skills.get(group.pk, [])}
+            for group in SkillGroup.objects.order_by('pk')
+        ],
+        'education': [
+            {'degree': education.degree, 'institution': education.institution, 'location': education.location}
+            for education in resume.education_set.order_by('pk')
+        ],
+        'work': [
+            {
+                'title': work.title, 'company': work.company, 'location': work.location,
+                'start_date': work.start_date, 'end_date': work.end_date,
+                'items': _texts(work.workexperienceitem_set.all()),
+            }
+            for work in _with_items(resume.workexperience_set, WorkExperienceItem)
+        ],
+        'academic': [
+            {
+                'experience_type': academic.experience_type, 'course': academic.course,
+                'institution': academic.institution,
+                'items': _texts(academic.academicexperienceitem_set.all()),
+            }
+            for academic in _with_items(resume.academicexperience_set, AcademicExperienceItem)
+        ],
+        'projects': [
+            {
+                'name': project.name, 'short_description': project.short_description,
+                'institution': project.institution,
+                'start_date': project.start_date, 'end_date': project.end_date,
+                'items': _texts(project.resumeprojectexperienceitem_set.all()),
+            }
+            for project in _with_items(resume.resumeproject_set, ResumeProjectExperienceItem)
+        ],
+        'volunteer': [
+            {
+                'title': volunteer.title, 'institution': volunteer.institution,
+                'location': volunteer.location,
+                'start_date': volunteer.start_date, 'end_date': volunteer.end_date,
+                'items': _texts(volunteer.volunteerexperienceitem_set.all()),
+            }
+            for volunteer in _with_items(resume.volunteerwork_set, VolunteerExperienceItem)
+        ],
+    }
+
+
+def get_resume_document():
+    """Return the current resume document, rebuilding it if any resume table was written to."""
+    global _document
+    tables = sorted(model_tables('resume'))
+    record_tables(*tables)
+    stamps = get_versions(*(table_stamp(table) for table in tables))
+
+    document = _document
+    if document is not None and document[0] == stamps:
+        return document[1]
+    with _lock:
+        if _document is not None and _document[0] == stamps:
+            return _document[1]
+        cached = cache.get(CACHE_KEY)
+        if cached is None or cached[0] != stamps:
+            # Stamps are read before the rows, so a concurrent write only
+            # makes the next call rebuild again.
+            cached = (stamps, build_resume_document())
+            cache.set(CACHE_KEY, cached, None)
+        _document = cached
+    return cached[1]
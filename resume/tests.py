@@ -1,3 +1,43 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from . import document
+from .models import Resume, WorkExperience, WorkExperienceItem
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ResumeDocumentTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        resume = Resume.objects.create(name='Ada', headline='Engineer', location='Zagreb', about_text='-')
+        cls.experience = WorkExperience.objects.create(
+            title='Engineer', company='Acme', location='Zagreb', start_date='2020', end_date='2024', resume=resume,
+        )
+        WorkExperienceItem.objects.create(text='Built things', experience=cls.experience)
+
+    def setUp(self):
+        cache.clear()
+        # Start each test without the worker's in-memory copy
+        self.enterContext(mock.patch.object(document, '_document', None))
+
+    def test_document_is_served_without_queries_until_a_write(self):
+        work = document.get_resume_document()['work']
+        self.assertEqual(work[0]['title'], 'Engineer')
+        self.assertEqual(work[0]['items'], ['Built things'])
+        with self.assertNumQueries(0):
+            document.get_resume_document()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.experience.title = 'Staff engineer'
+            self.experience.save()
+        self.assertEqual(document.get_resume_document()['work'][0]['title'], 'Staff engineer')
+
+    def test_other_workers_reuse_the_shared_copy(self):
+        document.get_resume_document()
+        with mock.patch.object(document, '_document', None), self.assertNumQueries(0):
+            self.assertEqual(document.get_resume_document()['work'][0]['company'], 'Acme')